@@ -1,19 +1,49 @@
-import os
 import logging
-import h5py
 import numpy as np
 import pandas as pd
 import concurrent.futures
-import scipy.sparse as sp
 from tqdm import tqdm
 from functools import partial
-from heig.utils import inv
-from scipy.sparse import csc_matrix, csr_matrix, dok_matrix, hstack, eye
+from scipy.sparse import csr_matrix, eye
+from scipy.spatial import cKDTree
 from sklearn.decomposition import IncrementalPCA
 from scipy.interpolate import make_interp_spline
 from heig.image import ImageManager
 
 
+def smooth_batch(images_, sparse_sm_weight, threads=1):
+    """
+    Smoothing a batch of images, i.e., images_ @ sparse_sm_weight.T.
+    Sparse products in scipy are single-threaded but release the GIL,
+    so subjects are split across threads.
+
+    Parameters:
+    ------------
+    images_ (n, N): a np.array of images
+    sparse_sm_weight (N, N): sparse kernel smoothing weights
+    threads: number of threads
+
+    Returns:
+    ---------
+    sm_images_ (n, N): a np.array of smoothed images
+
+    """
+    n_sub = images_.shape[0]
+    if threads <= 1 or n_sub < 2 * threads:
+        return images_ @ sparse_sm_weight.T
+
+    sm_images_ = np.empty((n_sub, sparse_sm_weight.shape[0]), dtype=images_.dtype)
+
+    def smooth_rows(rows):
+        sm_images_[rows] = images_[rows] @ sparse_sm_weight.T
+
+    bounds = np.linspace(0, n_sub, threads + 1).astype(int)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(smooth_rows, [slice(i, j) for i, j in zip(bounds[:-1], bounds[1:])]))
+
+    return sm_images_
+
+
 class KernelSmooth:
     def __init__(self, images):
         """
@@ -30,63 +60,70 @@ class KernelSmooth:
 
     def _gau_kernel(self, x):
         """
-        Calculating the Gaussian density
+        Calculating the product of standard Gaussian densities across dimensions,
+        which only needs one exp of the squared norm
 
         Parameters:
         ------------
-        x: a np.array of coordinates
+        x (m, d): a np.array of coordinates
 
         Returns:
         ---------
-        gau_k: Gaussian density
+        gau_k (m, ): Gaussian density
 
         """
-        gau_k = 1 / np.sqrt(2 * np.pi) * np.exp(-0.5 * x**2)
+        sq_norm = np.einsum("ij,ij->i", x, x)
+        gau_k = (2 * np.pi) ** (-0.5 * x.shape[1]) * np.exp(-0.5 * sq_norm)
 
         return gau_k
 
     def smoother(self):
         raise NotImplementedError
 
-    def gcv(self, bw_list, threads, temp_path):
+    def gcv(self, bw_list, threads, memory_budget=2**30):
         """
-        Generalized cross-validation for selecting the optimal bandwidth
+        Generalized cross-validation for selecting the optimal bandwidth.
+        Candidate smoothing matrices are scored in groups whose total size
+        fits in memory_budget, reading the raw images once per group.
+        At most one group, the best matrix so far, and the matrix being
+        built are alive at a time.
 
         Parameters:
         ------------
         bw_list: a array of candidate bandwidths
         threads: number of threads
-        temp_path: temporay directory to save a sparse smoothing matrix
+        memory_budget: max number of bytes of a group of smoothing matrices
 
         Returns:
         ---------
         sparse_sm_weight: the sparse smoothing matrix
 
         """
-        score = np.zeros(len(bw_list), dtype=np.float32)
-        min_score = np.Inf
+        score = np.full(len(bw_list), np.Inf, dtype=np.float32)
+        best = [np.Inf, None]  # min score and its smoothing matrix
+        group, group_nbytes = dict(), 0
 
         for cii, bw in enumerate(bw_list):
             self.logger.info(
-                f"Doing generalized cross-validation (GCV) for bandwidth {np.round(bw, 3)} ..."
+                f"Computing the smoothing matrix for bandwidth {np.round(bw, 3)} ..."
             )
             sparse_sm_weight = self.smoother(bw, threads)
-            if sparse_sm_weight is not None:
-                mean_sm_weight_diag = np.sum(sparse_sm_weight.diagonal()) / self.N
-                mean_diff = self._calculate_diff_parallel(sparse_sm_weight, threads)
-                score[cii] = mean_diff / (1 - mean_sm_weight_diag + 10**-10) ** 2
-
-                if score[cii] == 0:
-                    score[cii] = np.nan
-                    self.logger.info(f"This bandwidth is invalid.")
-                if score[cii] < min_score:
-                    min_score = score[cii]
-                    self._save_sparse_sm_weight(sparse_sm_weight, temp_path)
-                self.logger.info(
-                    f"The GCV score for bandwidth {np.round(bw, 3)} is {score[cii]:.3f}."
-                )
-            else:
-                score[cii] = np.Inf
+            if sparse_sm_weight is None:
+                continue
+            nbytes = (
+                sparse_sm_weight.data.nbytes
+                + sparse_sm_weight.indices.nbytes
+                + sparse_sm_weight.indptr.nbytes
+            )
+            if len(group) > 0 and group_nbytes + nbytes > memory_budget:
+                self._score_group(group, bw_list, score, best, threads)
+                group, group_nbytes = dict(), 0
+            group[cii] = sparse_sm_weight
+            group_nbytes += nbytes
+            del sparse_sm_weight
+        if len(group) > 0:
+            self._score_group(group, bw_list, score, best, threads)
+        del group
 
         which_min = np.nanargmin(score)
         if which_min == 0 or which_min == len(bw_list) - 1:
@@ -104,37 +141,60 @@ class KernelSmooth:
             f"The optimal bandwidth is {np.round(bw_opt, 3)} with GCV score {min_mse:.3f}."
         )
 
-        sparse_sm_weight = self._load_sparse_sm_weight(temp_path)
+        return best[1]
 
-        return sparse_sm_weight
+    def _score_group(self, group, bw_list, score, best, threads):
+        """
+        Computing GCV scores for a group of smoothing matrices in a single
+        pass over the raw images, updating score and best in place
 
-    @staticmethod
-    def _calculate_diff(images_, sparse_sm_weight):
-        return np.sum((images_ - images_ @ sparse_sm_weight.T) ** 2)
+        Parameters:
+        ------------
+        group: a dict of candidate index to sparse smoothing matrix
+        bw_list: a array of candidate bandwidths
+        score: a np.array of GCV scores of all candidates
+        best: a list of the min score so far and its smoothing matrix
+        threads: number of threads
 
-    def _calculate_diff_parallel(self, sparse_sm_weight, threads):
-        with concurrent.futures.ThreadPoolExecutor(max_workers=threads) as executor:
-            futures = [
-                executor.submit(self._calculate_diff, images_, sparse_sm_weight)
-                for images_, _ in self.images.image_reader()
-            ]
-            diff = [future.result() for future in futures]
-        mean_diff = np.sum(diff) / self.n
-
-        return mean_diff
-
-    @staticmethod
-    def _save_sparse_sm_weight(sparse_sm_weight, temp_path):
-        sparse_sm_weight = sparse_sm_weight.tocoo()
-        sp.save_npz(f"{temp_path}.npz", sparse_sm_weight)
-
-    @staticmethod
-    def _load_sparse_sm_weight(temp_path):
-        if not os.path.exists(f"{temp_path}.npz"):
-            raise FileNotFoundError(f'no {temp_path}.npz. Kernel smoothing failed')
-        sparse_sm_weight = sp.load_npz(f"{temp_path}.npz")
-        sparse_sm_weight = sparse_sm_weight.todok()
-        return sparse_sm_weight
+        """
+        self.logger.info("Doing generalized cross-validation (GCV) ...")
+        mean_diffs = self._calculate_diff(list(group.values()), threads)
+        for cii, mean_diff in zip(group, mean_diffs):
+            mean_sm_weight_diag = np.sum(group[cii].diagonal()) / self.N
+            score[cii] = mean_diff / (1 - mean_sm_weight_diag + 10**-10) ** 2
+            if score[cii] == 0:
+                score[cii] = np.nan
+                self.logger.info(f"Bandwidth {np.round(bw_list[cii], 3)} is invalid.")
+            if score[cii] < best[0]:
+                best[0], best[1] = score[cii], group[cii]
+            self.logger.info(
+                f"The GCV score for bandwidth {np.round(bw_list[cii], 3)} is {score[cii]:.3f}."
+            )
+
+    def _calculate_diff(self, sparse_sm_weights, threads):
+        """
+        Calculating the mean squared difference between raw and smoothed images
+        for multiple smoothing matrices, reading the raw images only once
+
+        Parameters:
+        ------------
+        sparse_sm_weights: a list of sparse smoothing matrices
+        threads: number of threads
+
+        Returns:
+        ---------
+        mean_diffs (m, ): mean squared difference for each smoothing matrix
+
+        """
+        diffs = np.zeros(len(sparse_sm_weights))
+        for images_, _ in self.images.image_reader(reuse_buffer=True):
+            for i, sparse_sm_weight in enumerate(sparse_sm_weights):
+                sm_image_ = smooth_batch(images_, sparse_sm_weight, threads)
+                np.subtract(images_, sm_image_, out=sm_image_)  # residuals in place
+                diffs[i] += np.einsum("ij,ij->", sm_image_, sm_image_)
+        mean_diffs = diffs / self.n
+
+        return mean_diffs
 
     def bw_cand(self):
         """
@@ -146,16 +206,17 @@ class KernelSmooth:
 
         """
         bw_raw = self.N ** (-1 / (4 + self.d))
-        weights = [0.5, 1, 2, 3, 5, 10]
-        bw_list = np.zeros((len(weights), self.d), dtype=np.float32)
-
-        for i, weight in enumerate(weights):
-            bw_list[i, :] = np.repeat(weight * bw_raw, self.d)
+        weights = np.array([0.5, 1, 2, 3, 5, 10])
+        bw_list = np.tile((weights * bw_raw)[:, None], (1, self.d)).astype(np.float32)
 
         return bw_list
 
 
 class LocalLinear(KernelSmooth):
+    def __init__(self, images):
+        super().__init__(images)
+        self.tree = cKDTree(self.coord)
+
     def smoother(self, bw, threads):
         """
         Local linear smoother
@@ -167,27 +228,35 @@ class LocalLinear(KernelSmooth):
 
         Returns:
         ---------
-        sparse_sm_weight (N, N): sparse kernel smoothing weights or None
+        sparse_sm_weight (N, N): sparse kernel smoothing weights in CSR or None
 
         """
-        sparse_sm_weight = dok_matrix((self.N, self.N), dtype=np.float32)
+        rows, cols, weights = list(), list(), list()
 
+        block_size = 256
+        blocks = [
+            np.arange(i, min(i + block_size, self.N))
+            for i in range(0, self.N, block_size)
+        ]
         partial_function = partial(self._sm_weight, bw)
         with concurrent.futures.ThreadPoolExecutor(max_workers=threads) as executor:
-            futures = {
-                executor.submit(partial_function, idx): idx for idx in range(self.N)
-            }
+            futures = [executor.submit(partial_function, idxs) for idxs in blocks]
 
             for future in concurrent.futures.as_completed(futures):
                 try:
-                    idx = futures[future]
-                    sm_weight, large_weight_idxs = future.result()
-                    sparse_sm_weight[idx, large_weight_idxs] = sm_weight
+                    rows_, cols_, weights_ = future.result()
+                    rows.append(rows_)
+                    cols.append(cols_)
+                    weights.append(weights_)
                 except Exception as exc:
                     executor.shutdown(wait=False)
                     raise RuntimeError(f"Computation terminated due to error: {exc}")
 
-        nonzero_weights = np.sum(sparse_sm_weight != 0, axis=0)
+        sparse_sm_weight = csr_matrix(
+            (np.concatenate(weights), (np.concatenate(rows), np.concatenate(cols))),
+            shape=(self.N, self.N),
+        )
+        nonzero_weights = sparse_sm_weight.getnnz(axis=0)
         if np.mean(nonzero_weights) > self.N // 10:
             self.logger.info(
                 (
@@ -200,105 +269,94 @@ class LocalLinear(KernelSmooth):
 
         return sparse_sm_weight
 
-    def _sm_weight(self, bw, idx):
+    def _sm_weight(self, bw, idxs):
         """
-        Computing smoothing weight for a voxel
+        Computing smoothing weights for a block of voxels
 
         Parameters:
         ------------
         bw (dim, 1): bandwidth for dim dimension
-        idx: voxel index
+        idxs (b, ): voxel indices
+
+        Returns:
+        ---------
+        rows (m, ): voxel indices
+        cols (m, ): indices of neighboring voxels
+        sm_weight (m, ): smoothing weights
 
         """
-        t_mat0 = self.coord - self.coord[idx]  # N * d
-        t_mat = np.hstack((np.ones(self.N).reshape(-1, 1), t_mat0))
-        dis = t_mat0 / bw
-        close_points = (dis < 4) & (dis > -4)  # keep only nearby voxels
-        k_mat = csr_matrix(
-            (self._gau_kernel(dis[close_points]), np.where(close_points)),
-            (self.N, self.d),
+        # candidate neighbors within 4 bandwidths in every dimension
+        pairs = cKDTree(self.coord[idxs]).sparse_distance_matrix(
+            self.tree, 4 * np.max(bw), p=np.inf, output_type="ndarray"
+        )
+        pairs = pairs[np.argsort(pairs["i"], kind="stable")]
+        rows, cols = pairs["i"], pairs["j"]
+        t_mat0 = self.coord[cols] - self.coord[idxs[rows]]  # m * d
+        # a scalar multiply for isotropic bandwidths from bw_cand() or --bw-opt
+        inv_bw = 1 / bw[0] if np.ptp(bw) == 0 else 1 / bw
+        dis = t_mat0 * inv_bw
+        close_points = np.all(np.abs(dis) < 4, axis=1)  # keep only nearby voxels
+        rows, cols = rows[close_points], cols[close_points]
+        t_mat0, dis = t_mat0[close_points], dis[close_points]
+        k = self._gau_kernel(dis) / np.prod(bw)  # m * 1
+        t_mat = np.hstack((np.ones((len(rows), 1)), t_mat0))  # m * (d+1)
+        kx = t_mat * k.reshape(-1, 1)  # m * (d+1)
+
+        # each voxel is a neighbor of itself, so every row appears in rows
+        starts = np.searchsorted(rows, np.arange(len(idxs)))
+        xtx = np.add.reduceat(
+            kx.reshape(-1, self.d + 1, 1) * t_mat.reshape(-1, 1, self.d + 1),
+            starts,
+            axis=0,
+        )  # b * (d+1) * (d+1)
+        xtx += np.eye(self.d + 1) * 0.000001
+        # xtx is symmetric, the first row of its inverse solves xtx @ x = e0
+        e0 = np.zeros((len(idxs), self.d + 1, 1))
+        e0[:, 0] = 1
+        xtx_inv = np.linalg.solve(xtx, e0)[:, :, 0]  # b * (d+1)
+        sm_weight = np.sum(kx * xtx_inv[rows], axis=1)  # m * 1
+        large_weight = np.abs(sm_weight) > 1 / self.N
+
+        return (
+            idxs[rows[large_weight]].astype(np.int32),
+            cols[large_weight].astype(np.int32),
+            sm_weight[large_weight].astype(np.float32),
         )
-        k_mat = csc_matrix(
-            np.prod((k_mat / bw).toarray(), axis=1)
-        ).T  # can be faster, update for scipy 1.11
-        k_mat_sparse = hstack([k_mat] * (self.d + 1))
-        kx = k_mat_sparse.multiply(t_mat).T  # (d+1) * N
-        sm_weight = inv(kx @ t_mat + np.eye(self.d + 1) * 0.000001)[0, :] @ kx  # N * 1
-        large_weight_idxs = np.where(np.abs(sm_weight) > 1 / self.N)
-
-        return sm_weight[large_weight_idxs], large_weight_idxs
 
 
-def do_kernel_smoothing(
-    raw_image_dir, sm_image_dir, keep_idvs, remove_idvs, bw_opt, threads, temp_path, skip_smoothing, log
-):
+def do_kernel_smoothing(raw_images, bw_opt, threads, skip_smoothing, log):
     """
     A wrapper function for doing kernel smoothing.
 
     Parameters:
     ------------
-    raw_image_dir: directory to HDF5 file of raw images
-    sm_image_dir: directory to HDF5 file of smoothed images
-    keep_idvs: pd.MultiIndex of subjects to keep
-    remove_idvs: pd.MultiIndex of subjects to remove
+    raw_images: an ImageManager instance of raw images
     bw_opt (1, ): a scalar of optimal bandwidth
     threads: number of threads
-    temp_path: temporay directory to save a sparse smoothing matrix
     skip_smoothing: if skip kernel smoothing
     log: a logger
 
     Returns:
     ---------
-    subject_wise_mean (N, ): sample mean of smoothed images, used in PCA
+    sparse_sm_weight (N, N): sparse kernel smoothing weights
 
     """
-    try:
-        raw_images = ImageManager(raw_image_dir)
-        raw_images.keep_and_remove(keep_idvs, remove_idvs)
-        n_subjects = len(raw_images.id_idxs)
-        log.info(f"Using {n_subjects} subjects.")
-
-        ks = LocalLinear(raw_images)
-        if skip_smoothing:
-            sparse_sm_weight = eye(raw_images.n_voxels, format='csr')
-        elif bw_opt is None:
-            log.info("\nDoing kernel smoothing ...")
-            bw_list = ks.bw_cand()
-            log.info(f"Selecting the optimal bandwidth from\n{np.round(bw_list, 3)}.")
-            sparse_sm_weight = ks.gcv(bw_list, threads, temp_path)
-        else:
-            bw_opt = np.repeat(bw_opt, raw_images.dim)
-            log.info(f"Doing kernel smoothing using the optimal bandwidth.")
-            sparse_sm_weight = ks.smoother(bw_opt, threads)
-
-        if sparse_sm_weight is not None:
-            subject_wise_mean = np.zeros(raw_images.n_voxels, dtype=np.float32)
-            with h5py.File(sm_image_dir, "w") as h5f:
-                sm_images = h5f.create_dataset(
-                    "images", shape=(n_subjects, raw_images.n_voxels), dtype="float32"
-                )
-                start_idx, end_idx = 0, 0
-                for images_, _ in raw_images.image_reader():
-                    start_idx = end_idx
-                    end_idx += images_.shape[0]
-                    sm_image_ = images_ @ sparse_sm_weight.T
-                    sm_images[start_idx:end_idx] = sm_image_
-                    subject_wise_mean += np.sum(sm_image_, axis=0)
-                subject_wise_mean /= n_subjects
-                h5f.create_dataset(
-                    "id", data=np.array(raw_images.extracted_ids.tolist(), dtype="S10")
-                )
-                h5f.create_dataset("coord", data=raw_images.coord)
-                sm_images.attrs["id"] = "id"
-                sm_images.attrs["coord"] = "coord"
-        else:
+    ks = LocalLinear(raw_images)
+    if skip_smoothing:
+        sparse_sm_weight = eye(raw_images.n_voxels, dtype=np.float32, format='csr')
+    elif bw_opt is None:
+        log.info("\nDoing kernel smoothing ...")
+        bw_list = ks.bw_cand()
+        log.info(f"Selecting the optimal bandwidth from\n{np.round(bw_list, 3)}.")
+        sparse_sm_weight = ks.gcv(bw_list, threads)
+    else:
+        bw_opt = np.repeat(bw_opt, raw_images.dim)
+        log.info(f"Doing kernel smoothing using the optimal bandwidth.")
+        sparse_sm_weight = ks.smoother(bw_opt, threads)
+        if sparse_sm_weight is None:
             raise ValueError("the bandwidth provided by --bw-opt may be problematic")
-        
-        return subject_wise_mean
 
-    finally:
-        if 'raw_images' in locals():
-            raw_images.close()
+    return sparse_sm_weight
 
 
 class FPCA:
@@ -317,7 +375,15 @@ class FPCA:
         self.n_top = self._get_n_top(n_ldrs, max_n_pc, compute_all)
         self.batch_size = self._get_batch_size(max_n_pc, n_sub)
         self.n_batches = n_sub // self.batch_size
-        self.ipca = IncrementalPCA(n_components=self.n_top, batch_size=self.batch_size)
+        self.randomized = self.n_top <= max_n_pc * 0.1
+        if self.randomized:
+            # a few passes over the images are much cheaper than
+            # the big dense SVD in each partial fit of IncrementalPCA
+            self.ipca = None
+        else:
+            self.ipca = IncrementalPCA(
+                n_components=self.n_top, copy=False, batch_size=self.batch_size
+            )
         self.logger.info(f"Computing the top {self.n_top} components.")
 
     def _get_n_top(self, n_ldrs, max_n_pc, compute_all):
@@ -388,15 +454,90 @@ class FPCA:
 
         return np.max((batch_size, self.n_top))
 
+    def randomized_svd(self, images, sparse_sm_weight, n_iter=4):
+        """
+        Randomized SVD of column-centered smoothed images. Raw images are
+        streamed by batches, the smoothing and the mean are applied implicitly
+        by multiplying them to the small random matrices in each pass
 
-def do_fpca(sm_image_dir, subject_wise_mean, args, log):
+        Parameters:
+        ------------
+        images: an ImageManager instance of raw images
+        sparse_sm_weight (N, N): sparse kernel smoothing weights
+        n_iter: number of power iterations
+
+        Returns:
+        ---------
+        values (n_top, ): squared singular values
+        bases (N, n_top): right singular vectors
+
+        """
+        n_sub, n_voxels = images.n_sub, images.n_voxels
+        # oversampling by n_top for accurate trailing eigenvalues
+        n_random = min(2 * self.n_top, n_sub, n_voxels)
+
+        def read_batches():
+            end = 0
+            for images_, _ in images.image_reader(self.batch_size, reuse_buffer=True):
+                start, end = end, end + images_.shape[0]
+                yield start, end, images_
+
+        def times(right):
+            # (images @ W.T - 1 * mean) @ right
+            sm_right = sparse_sm_weight.T @ right
+            left = np.empty((n_sub, right.shape[1]), dtype=np.float32)
+            for start, end, images_ in read_batches():
+                left[start:end] = images_ @ sm_right
+            left -= mean @ right
+            return left
+
+        def times_t(left):
+            # (images @ W.T - 1 * mean).T @ left
+            right = np.zeros((n_voxels, left.shape[1]), dtype=np.float32)
+            for start, end, images_ in read_batches():
+                right += images_.T @ left[start:end]
+            right = sparse_sm_weight @ right
+            right -= np.outer(mean, np.sum(left, axis=0))
+            return right
+
+        # the first pass also computes the mean
+        omega = np.random.default_rng(42).standard_normal(
+            (n_voxels, n_random), dtype=np.float32
+        )
+        sm_omega = sparse_sm_weight.T @ omega
+        left = np.empty((n_sub, n_random), dtype=np.float32)
+        col_sum = np.zeros(n_voxels, dtype=np.float64)
+        for start, end, images_ in read_batches():
+            left[start:end] = images_ @ sm_omega
+            col_sum += np.sum(images_, axis=0, dtype=np.float64)
+        mean = sparse_sm_weight @ (col_sum / n_sub).astype(np.float32)
+        left -= mean @ omega
+        q, _ = np.linalg.qr(left)
+
+        for _ in range(n_iter):
+            q, _ = np.linalg.qr(times_t(q))
+            q, _ = np.linalg.qr(times(q))
+
+        bases, values, _ = np.linalg.svd(times_t(q), full_matrices=False)
+        bases = bases[:, : self.n_top]
+        values = values[: self.n_top] ** 2
+
+        # the largest absolute loading of each basis is positive
+        signs = np.sign(bases[np.argmax(np.abs(bases), axis=0), range(self.n_top)])
+        bases *= signs
+
+        return values, bases
+
+
+def do_fpca(raw_images, sparse_sm_weight, args, log):
     """
-    A wrapper function for doing functional PCA.
+    A wrapper function for doing functional PCA. Images are smoothed on the fly
+    so that smoothed images are never written to disk.
 
     Parameters:
     ------------
-    sm_image_dir: directory to HDF5 file of smoothed images
-    subject_wise_mean (N, ): sample mean of smoothed images, used in PCA
+    raw_images: an ImageManager instance of raw images
+    sparse_sm_weight (N, N): sparse kernel smoothing weights
     args: arguments
     log: a logger
 
@@ -407,15 +548,17 @@ def do_fpca(sm_image_dir, subject_wise_mean, args, log):
     fpca.n_top (1, ): #PCs
 
     """
-    try:
-        sm_images = ImageManager(sm_image_dir)
+    # setup parameters
+    log.info("\nDoing PCA ...")
+    fpca = FPCA(raw_images.n_sub, raw_images.n_voxels, args.all_pc, args.n_ldrs)
 
-        # setup parameters
-        log.info("\nDoing PCA ...")
-        fpca = FPCA(sm_images.n_sub, sm_images.n_voxels, args.all_pc, args.n_ldrs)
+    # randomized SVD
+    if fpca.randomized:
+        log.info("Doing randomized SVD as few components are required.")
+        values, bases = fpca.randomized_svd(raw_images, sparse_sm_weight)
 
-        # incremental PCA
-        max_avail_n_sub = fpca.n_batches * fpca.batch_size
+    # incremental PCA
+    else:
         log.info(
             (
                 f"The smoothed images are split into {fpca.n_batches} batch(es), "
@@ -423,23 +566,25 @@ def do_fpca(sm_image_dir, subject_wise_mean, args, log):
             )
         )
 
-        image_reader = sm_images.image_reader(fpca.batch_size)
-        for _ in tqdm(
-            range(0, max_avail_n_sub, fpca.batch_size),
-            desc=f"{fpca.n_batches} batch(es)",
-        ):
-            fpca.ipca.partial_fit(
-                next(image_reader)[0] - subject_wise_mean
-            )
-        values = (fpca.ipca.singular_values_**2).astype(np.float32)
+        # the last incomplete batch is dropped
+        image_reader = raw_images.image_reader(fpca.batch_size, reuse_buffer=True)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+            future = executor.submit(next, image_reader)
+            for i in tqdm(range(fpca.n_batches), desc=f"{fpca.n_batches} batch(es)"):
+                # a fresh array, which IncrementalPCA centers in place
+                sm_images_ = smooth_batch(
+                    future.result()[0], sparse_sm_weight, args.threads
+                )
+                # the buffer is free now, prefetching the next batch during fitting
+                if i + 1 < fpca.n_batches:
+                    future = executor.submit(next, image_reader)
+                fpca.ipca.partial_fit(sm_images_)
+        values = fpca.ipca.singular_values_**2
         bases = fpca.ipca.components_.T
-        bases = bases.astype(np.float32)
+    values = values.astype(np.float32)
+    bases = bases.astype(np.float32)
 
-        return values, bases, fpca.n_top
-    
-    finally:
-        if 'sm_images' in locals():
-            sm_images.close()
+    return values, bases, fpca.n_top
 
 
 class EigenValues:
@@ -542,34 +687,23 @@ def check_input(args, log):
     if args.bw_opt is not None and args.bw_opt <= 0:
         raise ValueError("--bw-opt should be positive")
 
-    temp_path = os.path.join(os.path.dirname(args.out), "temp_sparse_sm_weight")
-    i = np.random.choice(1000000, 1)[0] 
-    temp_path += str(i)
-
-    return temp_path
-
 
 def run(args, log):
     # check input
-    temp_path = check_input(args, log)
+    check_input(args, log)
 
     try:
+        raw_images = ImageManager(args.image)
+        raw_images.keep_and_remove(args.keep, args.remove)
+        log.info(f"Using {raw_images.n_sub} subjects.")
+
         # kernel smoothing
-        sm_image_dir = f"{args.out}_sm_images.h5"
-        subject_wise_mean = do_kernel_smoothing(
-            args.image,
-            sm_image_dir,
-            args.keep,
-            args.remove,
-            args.bw_opt,
-            args.threads,
-            temp_path,
-            args.skip_smoothing,
-            log,
+        sparse_sm_weight = do_kernel_smoothing(
+            raw_images, args.bw_opt, args.threads, args.skip_smoothing, log
         )
 
         # fPCA
-        values, bases, n_top = do_fpca(sm_image_dir, subject_wise_mean, args, log)
+        values, bases, n_top = do_fpca(raw_images, sparse_sm_weight, args, log)
         eigenvalues = EigenValues(values, bases.shape[0])
 
         np.save(f"{args.out}_bases_top{n_top}.npy", bases)
@@ -587,7 +721,5 @@ def run(args, log):
         log.info(f"Save the number of LDRs table to {args.out}_ldrs_prop_var.txt")
 
     finally:
-        if os.path.exists(f"{temp_path}.npz"):
-            os.remove(f"{temp_path}.npz")
-        if os.path.exists(sm_image_dir):
-            os.remove(sm_image_dir)
+        if 'raw_images' in locals():
+            raw_images.close()
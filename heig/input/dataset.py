@@ -220,6 +220,33 @@ class Covar(Dataset):
             return np.linalg.cond(self.data) >= 1 / sys.float_info.epsilon
 
 
+def ids_from_bytes(ids):
+    """
+    Converting an array of byte-string ids read from a HDF5 file
+    to a pd.MultiIndex. Only unique ids are decoded, and the codes
+    are obtained by numpy without creating Python objects.
+
+    Parameters:
+    ------------
+    ids (n, 2): a np.array of FID and IID in bytes
+
+    Returns:
+    ---------
+    ids: a pd.MultiIndex of FID and IID in str
+
+    """
+    levels, codes = list(), list()
+    for col in ids.T:
+        uniques, inverse = np.unique(col, return_inverse=True)
+        levels.append(uniques.astype(str))
+        codes.append(inverse)
+    ids = pd.MultiIndex(
+        levels=levels, codes=codes, names=["FID", "IID"], verify_integrity=False
+    )
+
+    return ids
+
+
 def get_common_idxs(*idx_list, single_id=False):
     """
     Getting common indices among a list of double indices for subjects.
@@ -639,6 +666,34 @@ def check_existence(arg, suffix=""):
         raise FileNotFoundError(f"{arg}{suffix} does not exist")
 
 
+def check_existence_batch(checks):
+    """
+    Checking existence of multiple files with one directory listing
+    per parent directory instead of one stat call per file
+
+    Parameters:
+    ------------
+    checks: a list of (arg, suffix)
+
+    """
+    dirs = dict()
+    for arg, suffix in checks:
+        if arg is not None:
+            path = os.path.normpath(f"{arg}{suffix}")
+            dirs.setdefault(os.path.dirname(path), []).append((arg, suffix, path))
+
+    for dirname, paths in dirs.items():
+        try:
+            with os.scandir(dirname or ".") as it:
+                names = {entry.name for entry in it}
+        except OSError:
+            names = set()
+        for arg, suffix, path in paths:
+            # fall back to a stat, e.g., for case-insensitive file systems
+            if os.path.basename(path) not in names:
+                check_existence(arg, suffix)
+
+
 class ReadCsvParallel:
     def __init__(self, filename, threads):
         self.filename = filename
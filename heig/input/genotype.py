@@ -1,6 +1,9 @@
+import os
+import logging
+import concurrent.futures
+from functools import lru_cache, cached_property
 import pandas as pd
 import numpy as np
-import bitarray as ba
 from heig import utils
 
 
@@ -11,6 +14,31 @@ https://github.com/bulik/ldsc
 """
 
 
+def _get_single_sep(fname):
+    """
+    Getting the delimiter if the first line is delimited by single tabs
+    or single spaces, so that the file can be parsed by pyarrow
+
+    Parameters:
+    ------------
+    fname: directory to the file
+
+    Returns:
+    ---------
+    sep: a tab, a space, or None if fields are separated otherwise
+
+    """
+    with open(fname, "r") as file:
+        line = file.readline().rstrip("\r\n")
+    for sep in ("\t", " "):
+        fields = line.split(sep)
+        if len(fields) > 1 and all(
+            field and field.split() == [field] for field in fields
+        ):
+            return sep
+    return None
+
+
 def __ID_List_Factory__(
     colnames, keepcol, id_dtypes, fname_end, header=None, usecols=None
 ):
@@ -32,14 +60,33 @@ def __ID_List_Factory__(
                 raise ValueError(f"{fname} must end in {end}")
 
             _, comp = utils.check_compression(fname)
-            self.df = pd.read_csv(
-                fname,
-                header=self.__header__,
-                usecols=self.__usecols__,
-                sep="\s+",
-                compression=comp,
-                dtype=self.__id_dtypes,
-            )
+            sep = _get_single_sep(fname) if comp is None else None
+            self.df = None
+            if sep is not None:
+                try:
+                    self.df = pd.read_csv(
+                        fname,
+                        header=self.__header__,
+                        usecols=self.__usecols__,
+                        sep=sep,
+                        dtype=self.__id_dtypes,
+                        engine="pyarrow",
+                    )
+                except (ImportError, ValueError) as e:
+                    # no pyarrow engine, or rows pyarrow cannot split
+                    logging.getLogger(__name__).debug(
+                        f"Falling back to whitespace parsing for {fname}: {e}"
+                    )
+                    self.df = None
+            if self.df is None:
+                self.df = pd.read_csv(
+                    fname,
+                    header=self.__header__,
+                    usecols=self.__usecols__,
+                    sep="\s+",
+                    compression=comp,
+                    dtype=self.__id_dtypes,
+                )
 
             if self.__colnames__:
                 self.df.columns = self.__colnames__
@@ -63,6 +110,153 @@ PlinkFAMFile = __ID_List_Factory__(
 # FilterFile = __ID_List_Factory__(['ID'], 0, {0: str}, None, usecols=[0])
 
 
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.int64)
+
+if hasattr(np, "bitwise_count"):
+    # numpy >= 2.0, hardware popcount
+    _popcount = np.bitwise_count
+else:
+
+    def _popcount(x):
+        return _POPCOUNT[x]
+
+
+# counts of a, b, and c of each byte packed in 21-bit fields,
+# so that one gather and one sum give all three counts for a SNP
+_COUNT_BITS = 21
+_COUNT_MASK = (1 << _COUNT_BITS) - 1
+_byte = np.arange(256)
+_COUNT_ABC = (
+    _POPCOUNT[_byte & 0x55]
+    | _POPCOUNT[_byte & 0xAA] << _COUNT_BITS
+    | _POPCOUNT[_byte & (_byte >> 1) & 0x55] << (2 * _COUNT_BITS)
+)
+del _byte
+
+
+def _count_genotypes(geno_bytes, snp_idxs, threads=1):
+    """
+    Counting bits of packed genotypes for each SNP
+
+    Parameters:
+    ------------
+    geno_bytes: a np.array of packed genotypes (m, nru // 4)
+    snp_idxs: numerical indices of SNPs to count (k, )
+    threads: number of threads
+
+    Returns:
+    ---------
+    a: number of first bits set, i.e., missing ct + hom major ct (k, )
+    b: number of second bits set, i.e., het ct + hom major ct (k, )
+    c: number of both bits set, i.e., hom major ct (k, )
+
+    """
+    a = np.zeros(len(snp_idxs), dtype=np.int64)
+    b = np.zeros(len(snp_idxs), dtype=np.int64)
+    c = np.zeros(len(snp_idxs), dtype=np.int64)
+    n_bytes = max(1, geno_bytes.shape[1])
+
+    if 4 * n_bytes <= _COUNT_MASK:
+        # packed fields cannot overflow
+        block_size = max(1, 2**20 // n_bytes)
+
+        def count_block(i):
+            block = geno_bytes[snp_idxs[i : i + block_size]]
+            abc = _COUNT_ABC[block].sum(axis=1)
+            a[i : i + block_size] = abc & _COUNT_MASK
+            b[i : i + block_size] = (abc >> _COUNT_BITS) & _COUNT_MASK
+            c[i : i + block_size] = abc >> (2 * _COUNT_BITS)
+
+    else:
+        block_size = max(1, 2**24 // n_bytes)
+
+        def count_block(i):
+            block = geno_bytes[snp_idxs[i : i + block_size]]
+            a[i : i + block_size] = _popcount(block & 0x55).sum(axis=1)
+            b[i : i + block_size] = _popcount(block & 0xAA).sum(axis=1)
+            c[i : i + block_size] = _popcount(block & (block >> 1) & 0x55).sum(
+                axis=1
+            )
+
+    # blocks write disjoint slices, and NumPy releases the GIL in the kernels
+    block_starts = range(0, len(snp_idxs), block_size)
+    if threads > 1 and len(block_starts) > 1:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=threads) as executor:
+            list(executor.map(count_block, block_starts))
+    else:
+        for i in block_starts:
+            count_block(i)
+
+    return a, b, c
+
+
+_GENO_CODES = ((np.arange(256)[:, None] >> (2 * np.arange(4))) & 3).astype(np.uint8)
+
+
+def _make_geno_lut(na_value, dtype=float):
+    """
+    Decoding table from a byte of 4 packed genotypes to their values,
+    the 2-bit codes 00, 01, 10, 11 are 0, NA, 1, 2
+
+    """
+    return np.array([0, na_value, 1, 2], dtype=dtype)[_GENO_CODES]
+
+
+_GENO_LUT = _make_geno_lut(np.nan)
+_GENO_LUT_NONA = _make_geno_lut(0)
+
+
+@lru_cache(maxsize=None)
+def _get_geno_lut(dtype, nona=False):
+    """
+    Decoding table for genotypes of a given dtype,
+    missing genotypes are NaN for float dtypes and -1 for integer dtypes,
+    or 0 for any dtype if nona
+
+    """
+    dtype = np.dtype(dtype)
+    if dtype == np.float64:
+        return _GENO_LUT_NONA if nona else _GENO_LUT
+    if nona:
+        na_value = 0
+    elif dtype.kind == "f":
+        na_value = np.nan
+    elif dtype.kind == "i":
+        na_value = -1
+    else:
+        raise ValueError(f"unsupported genotype dtype {dtype}")
+
+    return _make_geno_lut(na_value, dtype)
+
+
+def _filter_indivs_block(geno, byte_idxs, shifts, nru_new):
+    """
+    Extracting individuals from packed genotypes and repacking them
+
+    Parameters:
+    ------------
+    geno: a np.array of packed genotypes (k, nru // 4)
+    byte_idxs: byte of each kept individual in a row (n_new, )
+    shifts: bit offset of each kept individual in its byte (n_new, )
+    nru_new: n_new rounded up to a multiple of 4
+
+    Returns:
+    ---------
+    z: a np.array of packed genotypes of kept individuals (k, nru_new // 4)
+
+    """
+    codes = np.zeros((geno.shape[0], nru_new), dtype=np.uint8)
+    np.take(geno, byte_idxs, axis=1, out=codes[:, : len(byte_idxs)])
+    codes[:, : len(byte_idxs)] >>= shifts
+    codes &= 3
+    codes = codes.reshape(geno.shape[0], nru_new // 4, 4)
+    z = codes[:, :, 0] | codes[:, :, 1] << 2
+    z |= codes[:, :, 2] << 4
+    z |= codes[:, :, 3] << 6
+
+    return z
+
+
 class __GenotypeArrayInMemory__:
     """
     Parent class for various classes containing inferences for files with genotype
@@ -70,47 +264,80 @@ class __GenotypeArrayInMemory__:
     """
 
     def __init__(
-        self, fname, n, snp_list, keep_snps=None, keep_indivs=None, mafMin=None
+        self,
+        fname,
+        n,
+        snp_list,
+        keep_snps=None,
+        keep_indivs=None,
+        mafMin=None,
+        threads=1,
     ):
         self.m = len(snp_list)
         self.n = n
         self.keep_snps = keep_snps
         self.keep_indivs = keep_indivs
         self.df = snp_list
-        self.colnames = ["CHR", "SNP", "CM", "POS", "A1", "A2"]
         self.mafMin = mafMin if mafMin is not None else 0
+        self.threads = threads
         self._currentSNP = 0
         (self.nru, self.geno) = self.__read__(fname, n)
 
+        if keep_snps is not None:
+            keep_snps = np.array(keep_snps, dtype="int")
+            if np.any(keep_snps > self.m):  # if keep_snps is None, this returns False
+                raise ValueError("keep_snps indices out of bounds")
+
+        # filter individuals, repacking only the SNPs to keep
+        snp_idxs = None
         if keep_indivs is not None:
             keep_indivs = np.array(keep_indivs, dtype="int")
             if np.any(keep_indivs > self.n):
                 raise ValueError("keep_indivs indices out of bounds")
 
             (self.geno, self.m, self.n) = self.__filter_indivs__(
-                self.geno, keep_indivs, self.m
+                self.geno, keep_indivs, self.m, keep_snps
             )
             if self.n <= 0:
                 raise ValueError("After filtering, no individuals remain")
+            snp_idxs, keep_snps = keep_snps, None
 
         # filter SNPs
-        if keep_snps is not None:
-            keep_snps = np.array(keep_snps, dtype="int")
-            if np.any(keep_snps > self.m):  # if keep_snps is None, this returns False
-                raise ValueError("keep_snps indices out of bounds")
-
         (self.geno, self.m, self.n, self.kept_snps, self.freq) = (
             self.__filter_snps_maf__(self.geno, self.m, self.n, self.mafMin, keep_snps)
         )
+        if snp_idxs is not None:
+            self.kept_snps = snp_idxs[self.kept_snps]
 
         if self.m <= 0:
             raise ValueError("After filtering, no SNPs remain")
 
-        self.df = self.df.loc[self.kept_snps]
-        self.maf = np.minimum(self.freq, np.ones(self.m) - self.freq)
-        self.sqrtpq = np.sqrt(self.freq * (np.ones(self.m) - self.freq))
-        self.df["MAF"] = self.maf
-        self.colnames.append("MAF")
+        one_minus_freq = 1 - self.freq
+        self.maf = np.minimum(self.freq, one_minus_freq)
+        self.sqrtpq = np.sqrt(self.freq * one_minus_freq)
+        self.df = self.df.loc[self.kept_snps].assign(MAF=self.maf)
+
+    @cached_property
+    def _std_lut(self):
+        """
+        Per-SNP decoding table from the 2-bit codes 00, 01, 10, 11 to
+        standardized genotypes (x - 2f) / sqrt(2f(1 - f)), NA is set to 0.
+        Built on first use by nextSNPs_std
+
+        """
+        mean = 2 * self.freq
+        scale = np.divide(
+            1,
+            np.sqrt(2) * self.sqrtpq,
+            out=np.zeros(self.m),
+            where=self.sqrtpq > 0,
+        )
+        std_lut = np.zeros((self.m, 4))
+        std_lut[:, 0] = -mean * scale
+        std_lut[:, 2] = (1 - mean) * scale
+        std_lut[:, 3] = (2 - mean) * scale
+
+        return std_lut
 
     def __read__(self):
         raise NotImplementedError
@@ -128,15 +355,15 @@ class PlinkBEDFile(__GenotypeArrayInMemory__):
     """
 
     def __init__(
-        self, fname, n, snp_list, keep_snps=None, keep_indivs=None, mafMin=None
+        self,
+        fname,
+        n,
+        snp_list,
+        keep_snps=None,
+        keep_indivs=None,
+        mafMin=None,
+        threads=1,
     ):
-        self._bedcode = {
-            2: ba.bitarray("11"),
-            np.nan: ba.bitarray("10"),
-            1: ba.bitarray("01"),
-            0: ba.bitarray("00"),
-        }
-
         __GenotypeArrayInMemory__.__init__(
             self,
             fname,
@@ -145,6 +372,7 @@ class PlinkBEDFile(__GenotypeArrayInMemory__):
             keep_snps=keep_snps,
             keep_indivs=keep_indivs,
             mafMin=mafMin,
+            threads=threads,
         )
 
     def __read__(self, fname, n):
@@ -152,43 +380,48 @@ class PlinkBEDFile(__GenotypeArrayInMemory__):
             raise ValueError(".bed filename must end in .bed")
 
         with open(fname, "rb") as fh:
-            magicNumber = ba.bitarray(endian="little")
-            magicNumber.fromfile(fh, 2)
-            bedMode = ba.bitarray(endian="little")
-            bedMode.fromfile(fh, 1)
-            e = (4 - n % 4) if n % 4 != 0 else 0
-            nru = n + e
-            self.nru = nru
-
-            # check magic number
-            if magicNumber != ba.bitarray("0011011011011000"):
-                raise IOError("Magic number from PLINK .bed file not recognized")
-
-            if bedMode != ba.bitarray("10000000"):
-                raise IOError("Plink .bed file must be in default SNP-major mode")
-
-            # check file length
-            self.geno = ba.bitarray(endian="little")
-            self.geno.fromfile(fh)
-            self.__test_length__(self.geno, self.m, self.nru)
-            return (self.nru, self.geno)
-
-    def __test_length__(self, geno, m, nru):
-        exp_len = 2 * m * nru
-        real_len = len(geno)
+            header = fh.read(3)
+        e = (4 - n % 4) if n % 4 != 0 else 0
+        nru = n + e
+        self.nru = nru
+
+        # check magic number
+        if header[:2] != b"\x6c\x1b":
+            raise IOError("Magic number from PLINK .bed file not recognized")
+
+        if header[2:] != b"\x01":
+            raise IOError("Plink .bed file must be in default SNP-major mode")
+
+        # check file length, pages are read on demand and
+        # only kept SNPs are copied into memory by the MAF filter
+        self.__test_length__(os.path.getsize(fname) - 3, self.m, self.nru)
+        geno = np.memmap(fname, dtype=np.uint8, mode="r", offset=3)
+        self.geno = geno.reshape(self.m, self.nru // 4)
+        return (self.nru, self.geno)
+
+    def __test_length__(self, real_len, m, nru):
+        exp_len = m * nru // 4
         if real_len != exp_len:
-            raise IOError(f"Plink .bed file has {real_len} bits, expected {exp_len}")
+            raise IOError(f"Plink .bed file has {real_len} bytes, expected {exp_len}")
 
-    def __filter_indivs__(self, geno, keep_indivs, m):
+    def __filter_indivs__(self, geno, keep_indivs, m, keep_snps=None):
         n_new = len(keep_indivs)
         e = (4 - n_new % 4) if n_new % 4 != 0 else 0
         nru_new = n_new + e
-        nru = self.nru
-        z = ba.bitarray(m * 2 * nru_new, endian="little")
-        z.setall(0)
-        for e, i in enumerate(keep_indivs):
-            z[2 * e :: 2 * nru_new] = geno[2 * i :: 2 * nru]
-            z[2 * e + 1 :: 2 * nru_new] = geno[2 * i + 1 :: 2 * nru]
+        byte_idxs = keep_indivs >> 2
+        shifts = ((keep_indivs & 3) * 2).astype(np.uint8)
+        if keep_snps is not None:
+            m = len(keep_snps)
+        z = np.empty((m, nru_new // 4), dtype=np.uint8)
+        block_size = max(1, 2**22 // max(1, nru_new))
+        for i in range(0, m, block_size):
+            if keep_snps is None:
+                block = geno[i : i + block_size]
+            else:
+                block = geno[keep_snps[i : i + block_size]]
+            z[i : i + block_size] = _filter_indivs_block(
+                block, byte_idxs, shifts, nru_new
+            )
 
         self.nru = nru_new
         return (z, m, n_new)
@@ -219,83 +452,116 @@ class PlinkBEDFile(__GenotypeArrayInMemory__):
         major allele frequency = (b+c)/(2*(n-a+c))
         het ct + missing ct = a + b - 2*c
 
-        Why does bitarray not have >> ????
+        Genotypes are stored as packed bytes (m, nru // 4) and counted
+        by popcount, all SNPs in a block at once
 
         """
-        nru = self.nru
-        m_poly = 0
-        y = ba.bitarray()
         if keep_snps is None:
-            keep_snps = range(m)
-        kept_snps = []
-        freq = []
-        for j in keep_snps:
-            z = geno[2 * nru * j : 2 * nru * (j + 1)]
-            A = z[0::2]
-            a = A.count()
-            B = z[1::2]
-            b = B.count()
-            c = (A & B).count()
-            major_ct = b + c  # number of copies of the major allele
-            n_nomiss = n - a + c  # number of individuals with nonmissing genotypes
-            f = major_ct / (2 * n_nomiss) if n_nomiss > 0 else 0
-            het_miss_ct = (
-                a + b - 2 * c
-            )  # remove SNPs that are only either het or missing
-            if np.minimum(f, 1 - f) > mafMin and het_miss_ct < n:
-                freq.append(f)
-                y += z
-                m_poly += 1
-                kept_snps.append(j)
-
-        return (y, m_poly, n, kept_snps, freq)
-
-    def nextSNPs(self, num, nona=False):
+            keep_snps = np.arange(m)
+        a, b, c = _count_genotypes(geno, keep_snps, self.threads)
+        major_ct = b + c  # number of copies of the major allele
+        n_nomiss = n - a + c  # number of individuals with nonmissing genotypes
+        freq = np.zeros(len(keep_snps))
+        np.divide(major_ct, 2 * n_nomiss, out=freq, where=n_nomiss > 0)
+        het_miss_ct = a + b - 2 * c  # remove SNPs that are only either het or missing
+        kept = (np.minimum(freq, 1 - freq) > mafMin) & (het_miss_ct < n)
+
+        kept_snps = keep_snps[kept]
+
+        return (geno[kept_snps], len(kept_snps), n, kept_snps, freq[kept])
+
+    def nextSNPs(self, num, nona=False, dtype=float):
         """
         Unpacks the binary array of genotypes and returns an n x num matrix of
         genotypes for next SNPs, where n := number of samples.
         nona: if fill na as 0
+        dtype: a float or integer dtype of genotypes, missing genotypes are
+            NaN for float dtypes and -1 for integer dtypes (e.g. np.int8),
+            callers should mask them with np.isnan or == -1 accordingly
 
         """
-        nona_map = {
-            2: ba.bitarray("11"),
-            0: ba.bitarray("10"),  # na is mapped to 0
-            1: ba.bitarray("01"),
-            0: ba.bitarray("00"),
-        }
-        if nona:
-            mapping = nona_map
-        else:
-            mapping = self._bedcode
+        if num == 1:
+            return self.next_one_snp(nona, dtype)[:, None]
+
+        lut = _get_geno_lut(dtype, nona)
 
         if self._currentSNP + num > self.m:
             raise ValueError(
                 f"{num} SNPs requested, {self.m - self._currentSNP} SNPs remain"
             )
 
-        slice = self.geno[
-            2 * self._currentSNP * self.nru : 2 * (self._currentSNP + num) * self.nru
-        ]
-        snps = np.array(slice.decode(mapping), dtype=float).reshape((num, self.nru)).T
+        raw = self.geno[self._currentSNP : self._currentSNP + num]
+        snps = lut[raw].reshape((num, self.nru)).T
         snps = snps[: self.n]
         self._currentSNP += num
 
         return snps
 
+    def nextSNPs_std(self, num, dtype=float):
+        """
+        Unpacks the binary array of genotypes and returns an n x num matrix of
+        standardized genotypes (x - 2f) / sqrt(2f(1 - f)) for next SNPs,
+        where f is the allele frequency. Missing genotypes are set to 0.
+        Each SNP is decoded through its own 4-entry table in a single gather.
+        dtype: a float dtype of genotypes
+
+        """
+        if self._currentSNP + num > self.m:
+            raise ValueError(
+                f"{num} SNPs requested, {self.m - self._currentSNP} SNPs remain"
+            )
+
+        c0, c1 = self._currentSNP, self._currentSNP + num
+        codes = _GENO_CODES[self.geno[c0:c1]].reshape((num, self.nru))
+        std_lut = self._std_lut[c0:c1].astype(dtype, copy=False)
+        snps = np.take_along_axis(std_lut, codes, axis=1).T
+        snps = snps[: self.n]
+        self._currentSNP += num
+
+        return snps
+
+    def next_one_snp(self, nona=False, dtype=float):
+        """
+        Unpacks the genotypes of the next SNP into a vector of length n,
+        decoding its row of bytes with a single table lookup
+        nona: if fill na as 0
+        dtype: dtype of genotypes, see nextSNPs
+
+        """
+        if self._currentSNP >= self.m:
+            raise ValueError("1 SNPs requested, 0 SNPs remain")
+
+        lut = _get_geno_lut(dtype, nona)
+        snp = lut[self.geno[self._currentSNP]].ravel()[: self.n]
+        self._currentSNP += 1
+
+        return snp
+
+    def gen_SNPs_batched(self, batch=1024, dtype=float):
+        """
+        Yields the index of the first SNP and a batch x n matrix of genotypes
+        for each batch of SNPs
+        dtype: dtype of genotypes, see nextSNPs
+
+        """
+        lut = _get_geno_lut(dtype)
+        for c0 in range(0, self.m, batch):
+            raw = self.geno[c0 : c0 + batch]
+            X = lut[raw].reshape((-1, self.nru))[:, : self.n]
+
+            yield c0, X
+
     def gen_SNPs(self):
         """
         Never use it
 
         """
-        for c in range(self.m):
-            slice = self.geno[2 * c * self.nru : 2 * (c + 1) * self.nru]
-            X = np.array(slice.decode(self._bedcode), dtype=float)
-            X = X[0 : self.n]
-
-            yield c, X
+        for c0, X_batch in self.gen_SNPs_batched():
+            for i, X in enumerate(X_batch):
+                yield c0 + i, X
 
 
-def read_plink(dir, keep_snps=None, keep_indivs=None, maf=None):
+def read_plink(dir, keep_snps=None, keep_indivs=None, maf=None, threads=1):
     """
     Read plink triplets with a subset of SNPs/individuals
 
@@ -305,6 +571,7 @@ def read_plink(dir, keep_snps=None, keep_indivs=None, maf=None):
     keep_snps:  rsID of SNPs to extract
     keep_indivs: ID of individuals to keep
     maf: minimum MAF of SNPs to extract
+    threads: number of threads
 
     Returns:
     ---------
@@ -344,6 +611,7 @@ def read_plink(dir, keep_snps=None, keep_indivs=None, maf=None):
         keep_snps=keep_snps_idxs,
         keep_indivs=keep_indivs_idxs,
         mafMin=maf,
+        threads=threads,
     )
     snp_getter = geno_array.nextSNPs
 
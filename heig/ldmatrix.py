@@ -486,9 +486,12 @@ def filter_maf(
     ld_inv_keep_snp,
     ld_inv_keep_idv,
     min_maf,
+    threads=1,
 ):
-    ld_bim2, *_ = gt.read_plink(ld_bfile, ld_keep_snp, ld_keep_idv)
-    ld_inv_bim2, *_ = gt.read_plink(ld_inv_bfile, ld_inv_keep_snp, ld_inv_keep_idv)
+    ld_bim2, *_ = gt.read_plink(ld_bfile, ld_keep_snp, ld_keep_idv, threads=threads)
+    ld_inv_bim2, *_ = gt.read_plink(
+        ld_inv_bfile, ld_inv_keep_snp, ld_inv_keep_idv, threads=threads
+    )
     common_snps = ld_bim2.loc[
         (ld_bim2["MAF"] >= min_maf) & (ld_inv_bim2["MAF"] >= min_maf)
     ]
@@ -539,15 +542,18 @@ def run(args, log):
             ld_inv_keep_snp,
             ld_inv_keep_idv,
             args.maf_min,
+            args.threads,
         )
         log.info(f"{len(common_snps)} SNPs remaining.")
 
     # reading bfiles
     log.info(f"Read bfile from {ld_bfile} with selected SNPs and individuals.")
-    ld_bim, _, ld_snp_getter = gt.read_plink(ld_bfile, common_snps, ld_keep_idv)
+    ld_bim, _, ld_snp_getter = gt.read_plink(
+        ld_bfile, common_snps, ld_keep_idv, threads=args.threads
+    )
     log.info(f"Read bfile from {ld_inv_bfile} with selected SNPs and individuals.")
     ld_inv_bim, _, ld_inv_snp_getter = gt.read_plink(
-        ld_inv_bfile, common_snps, ld_inv_keep_idv
+        ld_inv_bfile, common_snps, ld_inv_keep_idv, threads=args.threads
     )
 
     # reading and doing genome partition
@@ -1,7 +1,9 @@
 import numpy as np
-import threading
-import concurrent.futures
+import numexpr as ne
+from scipy.linalg.blas import sgemm
+from scipy.special import erfc
 from scipy.stats import chi2
+from threadpoolctl import threadpool_limits
 from tqdm import tqdm
 from heig import sumstats
 import heig.input.dataset as ds
@@ -25,16 +27,27 @@ class VGWAS:
         self.ldr_gwas = ldr_gwas
         self.ldr_idxs = list(range(ldr_gwas.n_gwas))
         self.snp_idxs = snp_idxs
-        self.n = n
-        self.ztz_inv = self._compute_ztz_inv(threads)  # (d, 1)
+        self.n_snps_kept = int(np.count_nonzero(snp_idxs))
+        self.inv_n = (1 / np.asarray(n, dtype=np.float32)).reshape(-1, 1)
+        self.ldr_cov_chol = self._get_ldr_cov_chol()
+        ne.set_num_threads(threads)
+        self.ztz_inv = self._compute_ztz_inv()  # (d, 1)
 
-    def _compute_ztz_inv(self, threads):
+    def _get_ldr_cov_chol(self):
         """
-        Computing (Z'Z)^{-1} from summary statistics
+        Cholesky factor L of ldr_cov (ldr_cov = LL'), or None if ldr_cov
+        is not positive definite
 
-        Parameters:
-        ------------
-        threads: number of threads
+        """
+        try:
+            ldr_cov_chol = np.linalg.cholesky(self.ldr_cov.astype(np.float64))
+        except np.linalg.LinAlgError:
+            return None
+        return ldr_cov_chol.astype(np.float32)
+
+    def _compute_ztz_inv(self):
+        """
+        Computing (Z'Z)^{-1} from summary statistics
 
         Returns:
         ---------
@@ -42,60 +55,42 @@ class VGWAS:
 
         """
         ldr_var = np.diag(self.ldr_cov)
-        ztz_inv = np.zeros(np.sum(self.snp_idxs), dtype=np.float32)
+        ztz_inv = np.zeros(self.n_snps_kept, dtype=np.float32)
         n_ldrs = self.bases.shape[1]
 
-        futures = []
         i = 0
         data_reader = self.ldr_gwas.data_reader(
             "both", self.ldr_idxs, self.snp_idxs, all_gwas=False
         )
-        lock = threading.Lock()
-
-        with concurrent.futures.ThreadPoolExecutor(max_workers=threads) as executor:
-            for ldr_beta_batch, ldr_z_batch in data_reader:
-                futures.append(
-                    executor.submit(
-                        self._compute_ztz_inv_batch,
-                        ztz_inv,
-                        ldr_beta_batch,
-                        ldr_z_batch,
-                        ldr_var,
-                        i,
-                        lock,
-                    )
-                )
-                batch_size = ldr_beta_batch.shape[1]
-                i += batch_size
-
-            for future in concurrent.futures.as_completed(futures):
-                try:
-                    future.result()
-                except Exception as exc:
-                    executor.shutdown(wait=False)
-                    raise RuntimeError(f"Computation terminated due to error: {exc}")
+        for ldr_beta_batch, ldr_z_batch in data_reader:
+            batch_size = ldr_beta_batch.shape[1]
+            ztz_inv += self._compute_ztz_inv_batch(
+                ldr_beta_batch, ldr_z_batch, ldr_var[i : i + batch_size]
+            )
+            i += batch_size
 
         ztz_inv /= n_ldrs
         ztz_inv = ztz_inv.reshape(-1, 1)
 
         return ztz_inv
 
-    def _compute_ztz_inv_batch(
-        self, ztz_inv, ldr_beta_batch, ldr_z_batch, ldr_var, i, lock
-    ):
+    def _compute_ztz_inv_batch(self, ldr_beta_batch, ldr_z_batch, ldr_var_batch):
         """
-        Computing (Z'Z)^{-1} from summary statistics in batch
+        Computing (Z'Z)^{-1} from summary statistics in batch,
+        the elementwise part is fused by numexpr in one pass
 
         """
-        ldr_se_batch = ldr_beta_batch / ldr_z_batch
-        batch_size = ldr_beta_batch.shape[1]
-        ztz_inv_batch = np.sum(
-            (ldr_se_batch * ldr_se_batch + ldr_beta_batch * ldr_beta_batch / self.n)
-            / ldr_var[i : i + batch_size],
-            axis=1,
-        )
-        with lock:
-            ztz_inv += ztz_inv_batch
+        ztz_inv_batch = ne.evaluate(
+            "(beta * beta / (z * z) + beta * beta * inv_n) / var",
+            local_dict={
+                "beta": ldr_beta_batch,
+                "z": ldr_z_batch,
+                "inv_n": self.inv_n,
+                "var": ldr_var_batch,
+            },
+        ).sum(axis=1)
+
+        return ztz_inv_batch
 
     def recover_beta(self, voxel_idxs, threads):
         """
@@ -112,50 +107,43 @@ class VGWAS:
 
         """
         voxel_beta = np.zeros(
-            (np.sum(self.snp_idxs), len(voxel_idxs)), dtype=np.float32
+            (self.n_snps_kept, len(voxel_idxs)), dtype=np.float32
         )
         data_reader = self.ldr_gwas.data_reader(
             "beta", self.ldr_idxs, self.snp_idxs, all_gwas=False
         )
-        base = self.bases[voxel_idxs]  # (q, r)
+        if voxel_beta.size == 0:
+            return voxel_beta
+        base = np.asarray(self.bases[voxel_idxs], dtype=np.float32)  # (q, r)
 
-        lock = threading.Lock()
         i = 0
-        futures = []
-
-        with concurrent.futures.ThreadPoolExecutor(max_workers=threads) as executor:
+        with threadpool_limits(limits=threads, user_api="blas"):
             for ldr_beta_batch in data_reader:
-                futures.append(
-                    executor.submit(
-                        self._recover_beta_batch,
-                        voxel_beta,
-                        ldr_beta_batch,
-                        base,
-                        i,
-                        lock,
-                    )
-                )
                 batch_size = ldr_beta_batch.shape[1]
+                self._recover_beta_batch(
+                    voxel_beta, ldr_beta_batch, base[:, i : i + batch_size]
+                )
                 i += batch_size
 
-            for future in concurrent.futures.as_completed(futures):
-                try:
-                    future.result()
-                except Exception as exc:
-                    executor.shutdown(wait=False)
-                    raise RuntimeError(f"Computation terminated due to error: {exc}")
-
         return voxel_beta
 
-    def _recover_beta_batch(self, voxel_beta, ldr_beta_batch, base, i, lock):
+    def _recover_beta_batch(self, voxel_beta, ldr_beta_batch, base_batch):
         """
-        Computing voxel beta in batch
+        Accumulating voxel beta in batch in place by sgemm.
+        voxel_beta.T is Fortran-ordered, so BLAS writes into it without a copy
 
         """
-        batch_size = ldr_beta_batch.shape[1]
-        voxel_beta_batch = np.dot(ldr_beta_batch, base[:, i : i + batch_size].T)
-        with lock:
-            voxel_beta += voxel_beta_batch
+        voxel_beta_t = sgemm(
+            1.0,
+            np.asfortranarray(base_batch),
+            np.asarray(ldr_beta_batch, dtype=np.float32).T,
+            beta=1.0,
+            c=voxel_beta.T,
+            overwrite_c=1,
+        )
+        if not np.shares_memory(voxel_beta_t, voxel_beta):
+            # f2py made a copy of c
+            voxel_beta[:] = voxel_beta_t.T
 
     def recover_se(self, voxel_idxs, voxel_beta):
         """
@@ -172,13 +160,23 @@ class VGWAS:
 
         """
         base = np.atleast_2d(self.bases[voxel_idxs])  # (q, r)
-        part1 = np.sum(np.dot(base, self.ldr_cov) * base, axis=1)  # (q, )
-        voxel_beta_squared = voxel_beta * voxel_beta
-        voxel_beta_squared /= self.n
-        voxel_se = part1 * self.ztz_inv
-        voxel_se -= voxel_beta_squared
-        np.sqrt(voxel_se, out=voxel_se)
-        # voxel_se = np.sqrt(part1 * self.ztz_inv - voxel_beta * voxel_beta / self.n) # slow
+        if self.ldr_cov_chol is not None:
+            # base @ ldr_cov @ base.T = ||base @ L||^2 row by row
+            base_chol = np.dot(base, self.ldr_cov_chol)  # (q, r)
+            part1 = np.einsum("qi,qi->q", base_chol, base_chol)  # (q, )
+        else:
+            part1 = np.einsum(
+                "qi,ij,qj->q", base, self.ldr_cov, base, optimize="optimal"
+            )  # (q, )
+        voxel_se = ne.evaluate(
+            "sqrt(part1 * ztz_inv - beta * beta * inv_n)",
+            local_dict={
+                "part1": part1[None, :],
+                "ztz_inv": self.ztz_inv,
+                "beta": voxel_beta,
+                "inv_n": self.inv_n,
+            },
+        )
 
         return voxel_se
 
@@ -215,89 +213,147 @@ def write_header(snp_info, outpath):
         file.write(output_header)
 
 
-def _process_voxels_batch(
-    i,
-    voxel_idx,
-    all_sig_idxs,
-    snp_info,
-    voxel_beta,
-    voxel_se,
-    voxel_z,
-    all_sig_idxs_voxel,
-):
+def format_snp_info(snp_info):
     """
-    Processing each voxel
+    Formatting each SNP as a tab-separated string once,
+    so that output rows can be assembled without pandas
+
+    Parameters:
+    ------------
+    snp_info: a pd.DataFrame of all SNPs (d, x)
+
+    Returns:
+    ---------
+    snp_info_str: a np.array of formatted SNP info (d, )
 
     """
-    if all_sig_idxs_voxel[i]:
-        sig_idxs = all_sig_idxs[:, i]
-        sig_snps = snp_info.loc[sig_idxs].copy()
-        sig_snps["BETA"] = voxel_beta[sig_idxs, i]
-        sig_snps["SE"] = voxel_se[sig_idxs, i]
-        sig_snps["Z"] = voxel_z[sig_idxs, i]
-        sig_snps["P"] = chi2.sf(sig_snps["Z"] ** 2, 1)
-        sig_snps.insert(0, "INDEX", [voxel_idx + 1] * np.sum(sig_idxs))
-        sig_snps_output = sig_snps.to_csv(
-            sep="\t", header=False, na_rep="NA", index=None, float_format="%.5e"
-        )
-        return i, sig_snps_output
-    return i, None
+    snp_info_str = snp_info.to_csv(
+        sep="\t", header=False, na_rep="NA", index=None, float_format="%.5e"
+    ).splitlines()
+    snp_info_str = np.array(snp_info_str, dtype=object)
+
+    return snp_info_str
+
+
+def get_sig_idxs(voxel_beta, voxel_se, thresh_chisq):
+    """
+    Testing z * z >= thresh_chisq without materializing z for all pairs.
+    As with z = beta / se, se == 0 is significant (z = +-inf) unless
+    beta == 0 as well (z is NaN)
+
+    Parameters:
+    ------------
+    voxel_beta: a np.array of voxel beta (d, q)
+    voxel_se: a np.array of voxel se (d, q)
+    thresh_chisq: a chi2 threshold of significance
+
+    Returns:
+    ---------
+    all_sig_idxs: a np.array of boolean significant indices (d, q)
+
+    """
+    all_sig_idxs = ne.evaluate(
+        "(beta * beta >= thresh * se * se) & ((beta != 0) | (se != 0))",
+        local_dict={
+            "beta": voxel_beta,
+            "se": voxel_se,
+            "thresh": np.float32(thresh_chisq),
+        },
+    )
+
+    return all_sig_idxs
 
 
 def process_voxels(
     voxel_idxs,
     all_sig_idxs,
-    snp_info,
+    snp_info_str,
     voxel_beta,
     voxel_se,
-    voxel_z,
-    all_sig_idxs_voxel,
     outpath,
-    threads,
+    max_rows=1000000,
 ):
     """
-    Processing voxels in parallel
+    Extracting significant results of all voxels at once and writing them
+    voxel by voxel, each write at most `max_rows` rows
 
     Parameters:
     ------------
     voxel_idxs: a list of voxel idxs (q)
     all_sig_idxs: a np.array of boolean significant indices (d, q)
-    snp_info: a pd.DataFrame of all SNPs (d, x)
+    snp_info_str: a np.array of formatted SNP info (d, )
     voxel_beta: a np.array of voxel beta (d, q)
     voxel_se: a np.array of voxel se (d, q)
-    voxel_z: a np.array of voxel z-score (d, q)
-    all_sig_idxs_voxel: a np.array of boolean indices of any significant SNPs (q, )
     outpath: a directory of output
-    threads: number of threads
+    max_rows: max number of rows in each write
 
     """
-    results_dict = {}
-    future_to_idx = {}
-    next_write_i = 0
-
-    with concurrent.futures.ThreadPoolExecutor(max_workers=threads) as executor:
-        for i, voxel_idx in enumerate(voxel_idxs):
-            result = executor.submit(
-                _process_voxels_batch,
-                i,
-                voxel_idx,
-                all_sig_idxs,
-                snp_info,
-                voxel_beta,
-                voxel_se,
-                voxel_z,
-                all_sig_idxs_voxel,
-            )
-            future_to_idx[result] = i
+    line_format = "%d\t%s\t%.5e\t%.5e\t%.5e\t%.5e\n"
+    voxel_idxs = np.asarray(voxel_idxs)
+    n_sig_voxel = np.cumsum(np.count_nonzero(all_sig_idxs, axis=0))
+    start = 0
+    with open(outpath, "ab") as file:
+        while start < len(voxel_idxs):
+            n_done = n_sig_voxel[start - 1] if start > 0 else 0
+            end = np.searchsorted(n_sig_voxel, n_done + max_rows, side="right")
+            end = min(max(end, start + 1), len(voxel_idxs))
+            # transposing so that rows are ordered by voxel first and SNP second
+            cols, rows = np.nonzero(all_sig_idxs[:, start:end].T)
+            if len(rows) > 0:
+                cols += start
+                sig_beta = voxel_beta[rows, cols]
+                sig_se = voxel_se[rows, cols]
+                sig_z = sig_beta / sig_se
+                # chi2.sf(z ** 2, 1) in closed form
+                sig_p = erfc(np.abs(sig_z.astype(np.float64)) * np.sqrt(0.5))
+                sig_snps_output = "".join(
+                    map(
+                        line_format.__mod__,
+                        zip(
+                            (voxel_idxs[cols] + 1).tolist(),
+                            snp_info_str[rows].tolist(),
+                            sig_beta.tolist(),
+                            sig_se.tolist(),
+                            sig_z.tolist(),
+                            sig_p.tolist(),
+                        ),
+                    )
+                )
+                file.write(sig_snps_output.encode())
+            start = end
+
+
+def get_interval_snp_idxs(snpinfo, target_chr, start_pos, end_pos):
+    """
+    Getting boolean indices of SNPs in (start_pos, end_pos) on target_chr.
+    SNPs are usually sorted by position within a chromosome, in which case
+    the interval is located by binary search
+
+    Parameters:
+    ------------
+    snpinfo: a pd.DataFrame of SNP info including CHR and POS (n, x)
+    target_chr: target chromosome
+    start_pos: starting position (exclusive)
+    end_pos: ending position (exclusive)
+
+    Returns:
+    ---------
+    snp_idxs: a np.array of boolean indices (n, )
+
+    """
+    chr_idxs = np.flatnonzero(snpinfo["CHR"].to_numpy() == target_chr)
+    pos = snpinfo["POS"].to_numpy()[chr_idxs]
+    if np.all(pos[1:] >= pos[:-1]):
+        start = np.searchsorted(pos, start_pos, side="right")
+        end = np.searchsorted(pos, end_pos, side="left")
+        chr_idxs = chr_idxs[start:end]
+    else:
+        chr_idxs = chr_idxs[(pos > start_pos) & (pos < end_pos)]
+    snp_idxs = np.zeros(snpinfo.shape[0], dtype=bool)
+    snp_idxs[chr_idxs] = True
+
+    return snp_idxs
 
-        for future in concurrent.futures.as_completed(future_to_idx):
-            i, sig_snps_output = future.result()
-            results_dict[i] = sig_snps_output
-            while next_write_i in results_dict:
-                if results_dict[next_write_i] is not None:
-                    with open(outpath, "a") as file:
-                        file.write(results_dict.pop(next_write_i))
-                next_write_i += 1
 
 def check_input(args, log):
     # required arguments
@@ -361,9 +417,9 @@ def run(args, log):
     target_chr, start_pos, end_pos = check_input(args, log)
 
     # reading data
-    ldr_cov = np.load(args.ldr_cov)
+    ldr_cov = np.ascontiguousarray(np.load(args.ldr_cov), dtype=np.float32)
     log.info(f"Read variance-covariance matrix of LDRs from {args.ldr_cov}")
-    bases = np.load(args.bases)
+    bases = np.ascontiguousarray(np.load(args.bases), dtype=np.float32)
     log.info(f"{bases.shape[1]} bases read from {args.bases}")
 
     try:
@@ -399,11 +455,9 @@ def run(args, log):
             args.voxels = np.arange(bases.shape[0])
 
         if target_chr:
-            snp_idxs = (
-                (ldr_gwas.snpinfo["POS"] > start_pos)
-                & (ldr_gwas.snpinfo["POS"] < end_pos)
-                & (ldr_gwas.snpinfo["CHR"] == target_chr)
-            ).to_numpy()
+            snp_idxs = get_interval_snp_idxs(
+                ldr_gwas.snpinfo, target_chr, start_pos, end_pos
+            )
             outpath += f"_chr{target_chr}_start{start_pos}_end{end_pos}.txt"
             log.info(
                 f"{np.sum(snp_idxs)} SNP(s) on chromosome {target_chr} from {start_pos} to {end_pos}."
@@ -425,6 +479,7 @@ def run(args, log):
             snp_idxs = snp_idxs & idx_exclude_snps
 
         # extracting SNPs
+        n_snps = int(np.count_nonzero(snp_idxs))
         ldr_n = np.array(ldr_gwas.snpinfo["N"]).reshape(-1, 1)
         ldr_n = ldr_n[snp_idxs]
         snp_info = ldr_gwas.snpinfo.loc[snp_idxs]
@@ -436,30 +491,26 @@ def run(args, log):
             thresh_chisq = 0
 
         # doing analysis
-        log.info(f"Recovering voxel-level GWAS results for {np.sum(snp_idxs)} SNP(s) ...")
+        log.info(f"Recovering voxel-level GWAS results for {n_snps} SNP(s) ...")
         write_header(snp_info, outpath)
+        snp_info_str = format_snp_info(snp_info)
         vgwas = VGWAS(bases, ldr_cov, ldr_gwas, snp_idxs, ldr_n, args.threads)
 
         for voxel_idxs in tqdm(
-            voxel_reader(np.sum(snp_idxs), args.voxels),
+            voxel_reader(n_snps, args.voxels),
             desc=f"Doing GWAS for {len(args.voxels)} voxels in batch",
         ):
             voxel_beta = vgwas.recover_beta(voxel_idxs, args.threads)
             voxel_se = vgwas.recover_se(voxel_idxs, voxel_beta)
-            voxel_z = voxel_beta / voxel_se
-            all_sig_idxs = voxel_z * voxel_z >= thresh_chisq
-            all_sig_idxs_voxel = all_sig_idxs.any(axis=0)
+            all_sig_idxs = get_sig_idxs(voxel_beta, voxel_se, thresh_chisq)
 
             process_voxels(
                 voxel_idxs,
                 all_sig_idxs,
-                snp_info,
+                snp_info_str,
                 voxel_beta,
                 voxel_se,
-                voxel_z,
-                all_sig_idxs_voxel,
                 outpath,
-                args.threads,
             )
 
         log.info(f"\nSave the output to {outpath}")
@@ -10,7 +10,13 @@ from heig.wgs.null import fit_null_model
 from heig.wgs.relatedness import LOCOpreds
 from heig.wgs.utils import read_genotype_data, init_hail, get_temp_path
 from heig.sumstats import GWASHEIG, read_sumstats
-from heig.voxelgwas import VGWAS, write_header, voxel_reader, process_voxels
+from heig.voxelgwas import (
+    VGWAS,
+    write_header,
+    voxel_reader,
+    format_snp_info,
+    process_voxels,
+)
 
 
 """
@@ -111,7 +117,7 @@ class Cluster:
         return cols_map, cols_map2
 
     def _generate_sample(self):
-        """
+        r"""
         A bootstrap sample is generated by v_i*\xi_{ij} for j = 1...r
         
         """
@@ -153,30 +159,27 @@ class Cluster:
         
         """
         rand_resid_ldrs = self.resid_ldrs.values() * rand_v
-        ldr_cov = np.dot(rand_resid_ldrs, rand_resid_ldrs) / self.n
+        ldr_cov = np.dot(rand_resid_ldrs.T, rand_resid_ldrs) / self.n
         sumstats = read_sumstats(f"{self.temp_path}_bootstrap_ldr_sumstats")
         ldr_n = np.array(sumstats.snpinfo["N"]).reshape(-1, 1)
-        snp_idxs = np.ones(self.n, dtype=bool)
-        write_header(sumstats.snpinfo, f"{self.temp_path}_bootstrap_vgwas.txt")
+        snp_idxs = np.ones(sumstats.snpinfo.shape[0], dtype=bool)
+        snp_info = sumstats.snpinfo.loc[snp_idxs]
+        write_header(snp_info, f"{self.temp_path}_bootstrap_vgwas.txt")
+        snp_info_str = format_snp_info(snp_info)
         vgwas = VGWAS(self.bases, ldr_cov, sumstats, snp_idxs, ldr_n, self.threads)
 
         for voxel_idxs in voxel_reader(np.sum(snp_idxs), self.voxels):
             voxel_beta = vgwas.recover_beta(voxel_idxs, self.threads)
             voxel_se = vgwas.recover_se(voxel_idxs, voxel_beta)
-            voxel_z = voxel_beta / voxel_se
-            all_sig_idxs = np.ones(voxel_z.shape, dtype=bool)
-            all_sig_idxs_voxel = all_sig_idxs.any(axis=0)
+            all_sig_idxs = np.ones(voxel_beta.shape, dtype=bool)
 
             process_voxels(
                 voxel_idxs,
                 all_sig_idxs,
-                sumstats.snpinfo,
+                snp_info_str,
                 voxel_beta,
                 voxel_se,
-                voxel_z,
-                all_sig_idxs_voxel,
                 f"{self.temp_path}_bootstrap_vgwas.txt",
-                self.threads,
             )
 
     def cluster_analysis(self):
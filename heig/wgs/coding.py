@@ -1,7 +1,7 @@
 import hail as hl
 import numpy as np
 import pandas as pd
-from functools import reduce
+from functools import reduce, lru_cache
 from heig.wgs.wgs import RVsumstats
 from heig.wgs.vsettest import VariantSetTest, cauchy_combination
 from heig.wgs.utils import *
@@ -17,6 +17,24 @@ OFFICIAL_NAME = {
     "ptv_ds": "PTV with eleterious score",
 }
 
+MISSENSE_TESTS = (
+    "SKAT(1,25)",
+    "SKAT(1,1)",
+    "Burden(1,25)",
+    "Burden(1,1)",
+    "ACAT-V(1,25)",
+    "ACAT-V(1,1)",
+)
+
+MISSENSE_STAAR_TESTS = (
+    "STAAR-S(1,25)",
+    "STAAR-S(1,1)",
+    "STAAR-B(1,25)",
+    "STAAR-B(1,1)",
+    "STAAR-A(1,25)",
+    "STAAR-A(1,1)",
+)
+
 
 class Coding:
     def __init__(self, annot, variant_type):
@@ -133,20 +151,21 @@ class Coding:
         is_rare: a np.array of boolean indices indicating MAC < mac_threshold
         
         """
+        filtered_annot = self.annot.filter(idx).key_by()
+        annot_cols = self.annot_cols if self.annot_cols is not None else []
+        # a single columnar transfer instead of one collect per field
+        annot_df = filtered_annot.select(
+            "idx", "maf", "is_rare", *annot_cols
+        ).to_pandas()
         if self.annot_cols is not None:
-            filtered_annot = self.annot.filter(idx)
-            numeric_idx = filtered_annot.idx.collect()
-            annot_phred = filtered_annot.select(*self.annot_cols).collect()
-            phred_cate = np.array(
-                [
-                    [getattr(row, col) for col in self.annot_cols]
-                    for row in annot_phred
-                ]
+            numeric_idx = annot_df["idx"].tolist()
+            phred_cate = annot_df[self.annot_cols].to_numpy(
+                dtype=np.float64, na_value=np.nan
             )
         else:
             numeric_idx, phred_cate = None, None
-        maf = np.array(filtered_annot.maf.collect())
-        is_rare = np.array(filtered_annot.is_rare.collect())
+        maf = annot_df["maf"].to_numpy(dtype=np.float64, na_value=np.nan)
+        is_rare = annot_df["is_rare"].to_numpy(dtype=bool)
         
         return numeric_idx, phred_cate, maf, is_rare
 
@@ -213,6 +232,19 @@ def coding_vset_analysis(
     return cate_pvalues
 
 
+@lru_cache(maxsize=None)
+def _missense_masks(columns):
+    """
+    Boolean masks of columns for each test in MISSENSE_TESTS,
+    cached since every gene has the same columns
+
+    """
+    return tuple(
+        np.array([column.startswith(test) for column in columns])
+        for test in MISSENSE_TESTS
+    )
+
+
 def process_missense(m_pvalues, dm_pvalues):
     """
     Incoporating disruptive missense results into missense
@@ -232,39 +264,18 @@ def process_missense(m_pvalues, dm_pvalues):
     n_m_variants = m_pvalues["n_variants"]
     m_pvalues = m_pvalues["pvalues"]
 
-    m_pvalues["SKAT(1,25)-Disruptive"] = dm_pvalues["SKAT(1,25)"]
-    m_pvalues["SKAT(1,1)-Disruptive"] = dm_pvalues["SKAT(1,1)"]
-    m_pvalues["Burden(1,25)-Disruptive"] = dm_pvalues["Burden(1,25)"]
-    m_pvalues["Burden(1,1)-Disruptive"] = dm_pvalues["Burden(1,1)"]
-    m_pvalues["ACAT-V(1,25)-Disruptive"] = dm_pvalues["ACAT-V(1,25)"]
-    m_pvalues["ACAT-V(1,1)-Disruptive"] = dm_pvalues["ACAT-V(1,1)"]
-
-    columns = m_pvalues.columns.values
-    skat_1_25 = np.array([column.startswith("SKAT(1,25)") for column in columns])
-    skat_1_1 = np.array([column.startswith("SKAT(1,1)") for column in columns])
-    burden_1_25 = np.array([column.startswith("Burden(1,25)") for column in columns])
-    burden_1_1 = np.array([column.startswith("Burden(1,1)") for column in columns])
-    acatv_1_25 = np.array([column.startswith("ACAT-V(1,25)") for column in columns])
-    acatv_1_1 = np.array([column.startswith("ACAT-V(1,1)") for column in columns])
-
-    staar_s_1_25 = cauchy_combination(m_pvalues.loc[:, skat_1_25].values.T)
-    staar_s_1_1 = cauchy_combination(m_pvalues.loc[:, skat_1_1].values.T)
-    staar_b_1_25 = cauchy_combination(m_pvalues.loc[:, burden_1_25].values.T)
-    staar_b_1_1 = cauchy_combination(m_pvalues.loc[:, burden_1_1].values.T)
-    staar_a_1_25 = cauchy_combination(m_pvalues.loc[:, acatv_1_25].values.T)
-    staar_a_1_1 = cauchy_combination(m_pvalues.loc[:, acatv_1_1].values.T)
-
-    m_pvalues["STAAR-S(1,25)"] = staar_s_1_25
-    m_pvalues["STAAR-S(1,1)"] = staar_s_1_1
-    m_pvalues["STAAR-B(1,25)"] = staar_b_1_25
-    m_pvalues["STAAR-B(1,1)"] = staar_b_1_1
-    m_pvalues["STAAR-A(1,25)"] = staar_a_1_25
-    m_pvalues["STAAR-A(1,1)"] = staar_a_1_1
-
-    all_columns = [skat_1_25, skat_1_1, burden_1_25, burden_1_1, acatv_1_25, acatv_1_1]
-    all_columns = reduce(np.logical_or, all_columns)
+    for test in MISSENSE_TESTS:
+        m_pvalues[f"{test}-Disruptive"] = dm_pvalues[test]
+
+    test_masks = _missense_masks(tuple(m_pvalues.columns))
+    pvalues = m_pvalues.values
+    for staar_test, mask in zip(MISSENSE_STAAR_TESTS, test_masks):
+        m_pvalues[staar_test] = cauchy_combination(pvalues[:, mask].T)
+
+    all_columns = reduce(np.logical_or, test_masks)
     all_columns = np.concatenate([all_columns, np.ones(6, dtype=bool)])
     m_pvalues["STAAR-O"] = cauchy_combination(m_pvalues.loc[:, all_columns].values.T)
+
     m_pvalues = {"n_variants": n_m_variants, "pvalues": m_pvalues}
 
     return m_pvalues
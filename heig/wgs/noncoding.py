@@ -50,20 +50,21 @@ class Noncoding(ABC):
         is_rare: a np.array of boolean indices indicating MAC < mac_threshold
         
         """
+        filtered_annot = self.annot.filter(self.variant_idx).key_by()
+        annot_cols = self.annot_cols if self.annot_cols is not None else []
+        # a single columnar transfer instead of one collect per field
+        annot_df = filtered_annot.select(
+            "idx", "maf", "is_rare", *annot_cols
+        ).to_pandas()
         if self.annot_cols is not None:
-            filtered_annot = self.annot.filter(self.variant_idx)
-            numeric_idx = filtered_annot.idx.collect()
-            annot_phred = filtered_annot.select(*self.annot_cols).collect()
-            phred_cate = np.array(
-                [
-                    [getattr(row, col) for col in self.annot_cols]
-                    for row in annot_phred
-                ]
+            numeric_idx = annot_df["idx"].tolist()
+            phred_cate = annot_df[self.annot_cols].to_numpy(
+                dtype=np.float64, na_value=np.nan
             )
         else:
             numeric_idx, phred_cate = None, None
-        maf = np.array(filtered_annot.maf.collect())
-        is_rare = np.array(filtered_annot.is_rare.collect())
+        maf = annot_df["maf"].to_numpy(dtype=np.float64, na_value=np.nan)
+        is_rare = annot_df["is_rare"].to_numpy(dtype=bool)
 
         return numeric_idx, phred_cate, maf, is_rare
 
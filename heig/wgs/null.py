@@ -31,7 +31,7 @@ class NullModel:
 
         self.n_voxels, self.n_ldrs = self.bases.shape
         self.n_subs = self.covar.shape[0]
-        self.ids = pd.MultiIndex.from_arrays(ids.astype(str).T, names=["FID", "IID"])
+        self.ids = ds.ids_from_bytes(ids)
         self.id_idxs = np.arange(self.n_subs)
         self.voxel_idxs = np.arange(self.n_voxels)
         self.logger = logging.getLogger(__name__)
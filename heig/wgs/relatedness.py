@@ -486,7 +486,7 @@ class LOCOpreds:
         self.file = h5py.File(file_path, "r")
         self.preds = self.file["ldr_loco_preds"]
         ids = self.file["id"][:]
-        self.ids = pd.MultiIndex.from_arrays(ids.astype(str).T, names=["FID", "IID"])
+        self.ids = ds.ids_from_bytes(ids)
         self.id_idxs = np.arange(len(self.ids))
         self.ldr_col = (0, self.preds.shape[0])
         self.logger = logging.getLogger(__name__)
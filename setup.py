@@ -18,9 +18,9 @@ setup(name='heig',
           'nibabel==5.2.1',
           'scipy==1.11.4',
           'scikit-learn==1.4.2',
-          'bitarray==2.9.2',
           'h5py==3.11.0',
           'numexpr==2.10.0',
+          'threadpoolctl==3.5.0',
           'tqdm==4.66.4',
           'pyarrow==17.0.0',
           'filelock==3.15.4',
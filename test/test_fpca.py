@@ -1,9 +1,12 @@
 import unittest
 import logging
 import numpy as np
+from scipy.sparse import diags, random
 
 from heig.fpca import (
-    FPCA
+    FPCA,
+    LocalLinear,
+    smooth_batch,
 )
 
 log = logging.getLogger()
@@ -39,6 +42,90 @@ def get_batch_size(n_top, max_n_pc, n_sub):
             return n_sub
 
 
+def sm_weight(coord, bw):
+    """
+    a dense version of local linear smoothing weights for easy test
+
+    """
+    N, d = coord.shape
+    weights = np.zeros((N, N))
+    for idx in range(N):
+        t_mat0 = coord - coord[idx]
+        t_mat = np.hstack((np.ones((N, 1)), t_mat0))
+        dis = t_mat0 / bw
+        k = np.prod(np.exp(-0.5 * dis**2) / np.sqrt(2 * np.pi) / bw, axis=1)
+        k[~np.all(np.abs(dis) < 4, axis=1)] = 0
+        kx = (t_mat * k.reshape(-1, 1)).T
+        weight = np.linalg.inv(kx @ t_mat + np.eye(d + 1) * 0.000001)[0, :] @ kx
+        weight[np.abs(weight) <= 1 / N] = 0
+        weights[idx] = weight
+
+    return weights
+
+
+class Images:
+    def __init__(self, coord, n_sub):
+        self.coord = coord
+        self.n_sub = n_sub
+
+
+class SmoothImages(Images):
+    def __init__(self, coord, images):
+        super().__init__(coord, images.shape[0])
+        self.images = images
+        self.n_passes = 0
+
+    def image_reader(self, batch_size=None, reuse_buffer=False):
+        self.n_passes += 1
+        for i in range(0, self.n_sub, 4):
+            yield self.images[i : i + 4], None
+
+
+class RawImages:
+    def __init__(self, images):
+        self.images = images
+        self.n_sub, self.n_voxels = images.shape
+
+    def image_reader(self, batch_size, reuse_buffer=False):
+        for i in range(0, self.n_sub, batch_size):
+            yield self.images[i : i + batch_size], None
+
+
+class Test_local_linear(unittest.TestCase):
+    def test_smoother(self):
+        rng = np.random.default_rng(0)
+        grid = np.stack(np.meshgrid(*[np.arange(10)] * 3, indexing="ij"), -1)
+        grid = grid.reshape(-1, 3)
+        coord = grid[rng.random(len(grid)) < 0.7].astype(np.float64)
+        ks = LocalLinear(Images(coord, 10))
+        bw = np.repeat(0.8, 3).astype(np.float32)
+
+        true_weights = sm_weight(coord, bw)
+        weights = ks.smoother(bw, 2)
+        self.assertEqual(weights.shape, (ks.N, ks.N))
+        self.assertTrue(np.allclose(true_weights, weights.toarray(), atol=1e-5))
+
+        self.assertIsNone(ks.smoother(bw * 3, 2))
+
+    def test_gcv(self):
+        rng = np.random.default_rng(0)
+        grid = np.stack(np.meshgrid(*[np.arange(30)] * 2, indexing="ij"), -1)
+        coord = grid.reshape(-1, 2).astype(np.float64)
+        images = SmoothImages(coord, rng.random((10, len(coord)), dtype=np.float32))
+        ks = LocalLinear(images)
+        bw_list = np.tile(np.array([0.5, 0.8, 1.1, 1.4])[:, None], (1, 2))
+
+        # all candidates are scored in a single pass
+        weights = ks.gcv(bw_list, 1)
+        self.assertEqual(images.n_passes, 1)
+
+        # one candidate per pass
+        images.n_passes = 0
+        weights_small = ks.gcv(bw_list, 1, memory_budget=1)
+        self.assertEqual(images.n_passes, len(bw_list))
+        self.assertTrue(np.allclose(weights.toarray(), weights_small.toarray()))
+
+
 class Test_get_n_top(unittest.TestCase):
     def test_get_n_top(self):
         fpca = FPCA(n_sub=100, n_voxels=10, compute_all=False, n_ldrs=15)
@@ -68,4 +155,39 @@ class Test_get_batch_size(unittest.TestCase):
         self.assertEqual(5000, get_batch_size(n_top=5000, n_sub=5000, max_n_pc=5000))
         self.assertEqual(10000, get_batch_size(n_top=2000, n_sub=10000, max_n_pc=2000))
         self.assertEqual(10000, get_batch_size(n_top=10000, n_sub=10000, max_n_pc=2000))
-        self.assertEqual(1000, get_batch_size(n_top=1000, n_sub=1000, max_n_pc=1000))
\ No newline at end of file
+        self.assertEqual(1000, get_batch_size(n_top=1000, n_sub=1000, max_n_pc=1000))
+
+
+class Test_randomized_svd(unittest.TestCase):
+    def test_randomized_svd(self):
+        rng = np.random.default_rng(0)
+        n_sub, n_voxels = 300, 1200
+        scale = np.arange(1, 61) ** -1.0
+        images = rng.normal(size=(n_sub, 60)) * scale @ rng.normal(size=(60, n_voxels))
+        images = (images + 0.05 * rng.normal(size=(n_sub, n_voxels))).astype(np.float32)
+        sparse_sm_weight = diags(
+            [np.full(n_voxels - 1, 0.25), np.full(n_voxels, 0.5), np.full(n_voxels - 1, 0.25)],
+            [-1, 0, 1], format="csr", dtype=np.float32
+        )
+        sm_images = images @ sparse_sm_weight.T
+        centered_sm_images = sm_images - np.mean(sm_images, axis=0)
+        _, true_values, true_bases = np.linalg.svd(centered_sm_images, full_matrices=False)
+
+        fpca = FPCA(n_sub=n_sub, n_voxels=n_voxels, compute_all=False, n_ldrs=20)
+        fpca.batch_size = 128
+        self.assertTrue(fpca.randomized)
+        values, bases = fpca.randomized_svd(RawImages(images), sparse_sm_weight)
+
+        self.assertTrue(np.allclose(true_values[:20] ** 2, values, rtol=1e-4))
+        cos = np.abs(np.sum(true_bases[:20].T * bases, axis=0))
+        self.assertTrue(np.allclose(cos, 1, atol=1e-3))
+
+
+class Test_smooth_batch(unittest.TestCase):
+    def test_smooth_batch(self):
+        images = np.random.default_rng(0).random((37, 500), dtype=np.float32)
+        sparse_sm_weight = random(500, 500, density=0.02, format="csr",
+                                  dtype=np.float32, random_state=0)
+        true_value = images @ sparse_sm_weight.T
+        for threads in [1, 4, 40]:
+            self.assertTrue(np.allclose(true_value, smooth_batch(images, sparse_sm_weight, threads)))
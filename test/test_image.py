@@ -235,6 +235,20 @@ class Test_image_manager(unittest.TestCase):
         assert_array_equal(self.true_coord, coord)
         assert_array_equal(self.true_ids[[2, 4]], ids)
 
+    def test_image_reader_reuse_buffer(self):
+        image_manager = ImageManager(os.path.join(self.folder, 'dir1_images.h5'))
+        to_remove_id = pd.MultiIndex.from_tuples([['s1000', 's1000']],
+                                                 names=["FID", "IID"])
+        image_manager.keep_and_remove(keep_idvs=None, remove_idvs=to_remove_id)
+        true_batches = [images_ for images_, _ in image_manager.image_reader(1)]
+        batches = [images_.copy() for images_, _
+                   in image_manager.image_reader(1, reuse_buffer=True)]
+        image_manager.close()
+
+        self.assertEqual(len(true_batches), len(batches))
+        for true_images_, images_ in zip(true_batches, batches):
+            assert_array_equal(true_images_, images_)
+
     def test_doing_nothing(self):
         image_manager = ImageManager(os.path.join(self.folder, 'dir3_images.h5'))
         image_manager.keep_and_remove()
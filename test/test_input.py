@@ -1,8 +1,9 @@
 import os
+import tempfile
 import unittest
 import numpy as np
 import pandas as pd
-from numpy.testing import assert_array_equal
+from numpy.testing import assert_array_equal, assert_allclose
 from pandas.testing import assert_frame_equal, assert_index_equal
 
 from heig.input.dataset import (
@@ -12,9 +13,11 @@ from heig.input.dataset import (
     Dataset,
     Covar,
     get_common_idxs,
-    parse_input
+    parse_input,
+    check_existence_batch,
+    ids_from_bytes
 )
-from heig.input.genotype import read_plink
+from heig.input.genotype import read_plink, PlinkBEDFile, PlinkBIMFile, PlinkFAMFile
 
 
 MAIN_DIR = os.getcwd()
@@ -137,6 +140,78 @@ class Test_read_plink(unittest.TestCase):
         assert_frame_equal(self.bim_df, bim)
         assert_frame_equal(self.fam_df, fam)
 
+    def test_one_snp(self):
+        bim, fam, snp_getter = read_plink(os.path.join(self.folder, 'plink'))
+        snp_mat = np.hstack([snp_getter(1) for _ in range(len(bim))])
+
+        self.screen_maf()
+
+        assert_array_equal(self.bed_mat, snp_mat)
+        self.assertRaises(ValueError, snp_getter, 1)
+
+    def test_dtype(self):
+        self.screen_maf()
+        bim, fam, snp_getter = read_plink(os.path.join(self.folder, 'plink'))
+        snp_mat = snp_getter(len(bim), dtype=np.float32)
+        self.assertEqual(snp_mat.dtype, np.float32)
+        assert_array_equal(self.bed_mat, snp_mat)
+
+        bim, fam, snp_getter = read_plink(os.path.join(self.folder, 'plink'))
+        snp_mat = snp_getter(len(bim), dtype=np.int8)
+        self.assertEqual(snp_mat.dtype, np.int8)
+        assert_array_equal(np.where(np.isnan(self.bed_mat), -1, self.bed_mat),
+                           snp_mat)
+
+    def test_std(self):
+        bim = PlinkBIMFile(os.path.join(self.folder, 'plink.bim'))
+        geno_array = PlinkBEDFile(os.path.join(self.folder, 'plink.bed'),
+                                  len(self.fam_df), bim.df)
+        self.assertNotIn('_std_lut', vars(geno_array))
+        snp_mat = geno_array.nextSNPs_std(geno_array.m)
+
+        freq = np.nanmean(self.bed_mat, axis=0) / 2
+        std_mat = (self.bed_mat - 2 * freq) / np.sqrt(2 * freq * (1 - freq))
+        std_mat[np.isnan(std_mat)] = 0
+
+        assert_allclose(std_mat, snp_mat, rtol=1e-5)
+        self.assertEqual(geno_array.nextSNPs_std(0).shape, (len(self.fam_df), 0))
+
+    def test_gen_snps_batched(self):
+        bim = PlinkBIMFile(os.path.join(self.folder, 'plink.bim'))
+        geno_array = PlinkBEDFile(os.path.join(self.folder, 'plink.bed'),
+                                  len(self.fam_df), bim.df)
+        batches = list(geno_array.gen_SNPs_batched(batch=2))
+        self.assertEqual([c0 for c0, _ in batches],
+                         list(range(0, geno_array.m, 2)))
+        snp_mat = np.concatenate([X for _, X in batches]).T
+
+        self.screen_maf()
+
+        assert_array_equal(self.bed_mat, snp_mat)
+
+
+class Test_plink_fam_file(unittest.TestCase):
+    def test_separators(self):
+        lines = [['s1', 's1', '0', '0', '1', '-9'], ['s2', 's2', '0', '0', '2', '-9']]
+        true_df = pd.DataFrame({'FID': ['s1', 's2'], 'IID': ['s1', 's2'], 'SEX': [1, 2]})
+        with tempfile.TemporaryDirectory() as tmpdir:
+            for i, sep in enumerate(['\t', ' ', '  ']):
+                fam_file = os.path.join(tmpdir, f'plink{i}.fam')
+                with open(fam_file, 'w') as file:
+                    file.write(''.join(sep.join(line) + '\n' for line in lines))
+                assert_frame_equal(PlinkFAMFile(fam_file).df, true_df)
+
+    def test_mixed_separators(self):
+        true_df = pd.DataFrame({'FID': ['s1', 's2'], 'IID': ['s1', 's2'], 'SEX': [1, 2]})
+        with tempfile.TemporaryDirectory() as tmpdir:
+            fam_file = os.path.join(tmpdir, 'plink.fam')
+            with open(fam_file, 'w') as file:
+                file.write('s1\ts1\t0\t0\t1\t-9\n')
+                file.write('s2\t\ts2\t0\t0\t2\t-9\n')
+            with self.assertLogs('heig.input.genotype', level='DEBUG'):
+                df = PlinkFAMFile(fam_file).df
+            assert_frame_equal(df, true_df)
+
 
 class Test_read_geno_part(unittest.TestCase):
     @classmethod
@@ -305,4 +380,25 @@ class Test_parse_input(unittest.TestCase):
         with self.assertRaises(ValueError):
             parse_input('file{1:a}.a')
         with self.assertRaises(ValueError):
-            parse_input('file{:}.a')
\ No newline at end of file
+            parse_input('file{:}.a')
+
+
+class Test_check_existence_batch(unittest.TestCase):
+    def setUp(self):
+        self.folder = os.path.join(MAIN_DIR, 'test', 'test_input', 'plink')
+
+    def test_check_existence_batch(self):
+        plink = os.path.join(self.folder, 'plink')
+        check_existence_batch([(plink, '.bed'), (plink, '.bim'), (plink, '.fam'),
+                               (self.folder, ''), (None, '')])
+        with self.assertRaises(FileNotFoundError):
+            check_existence_batch([(plink, '.bed'), (plink, '.npy')])
+        with self.assertRaises(FileNotFoundError):
+            check_existence_batch([(os.path.join(self.folder, 'no_dir', 'plink'), '.bed')])
+
+
+class Test_ids_from_bytes(unittest.TestCase):
+    def test_ids_from_bytes(self):
+        ids = np.array([['s2', 's2'], ['s1', 's3'], ['s10', 's1']], dtype='S10')
+        true_value = pd.MultiIndex.from_arrays(ids.astype(str).T, names=['FID', 'IID'])
+        assert_index_equal(true_value, ids_from_bytes(ids))
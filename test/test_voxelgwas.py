@@ -1,12 +1,19 @@
 import os
 import logging
+import tempfile
 import unittest
 import pandas as pd
 import numpy as np
+from numpy.testing import assert_array_equal
 from pandas.testing import assert_frame_equal
 
 from heig.voxelgwas import (
+    VGWAS,
     check_input,
+    format_snp_info,
+    get_interval_snp_idxs,
+    get_sig_idxs,
+    process_voxels,
 )
 
 
@@ -118,6 +125,153 @@ class Test_check_input(unittest.TestCase):
         #     check_input(args, log)
 
 
+class LDRGWAS:
+    def __init__(self, beta, z):
+        self.beta = beta
+        self.z = z
+        self.n_gwas = beta.shape[1]
+
+    def data_reader(self, data_type, gwas_idxs, snps_idxs, all_gwas=False):
+        for i in range(0, self.n_gwas, 20):
+            if data_type == 'both':
+                yield [self.beta[snps_idxs, i: i + 20], self.z[snps_idxs, i: i + 20]]
+            else:
+                yield self.beta[snps_idxs, i: i + 20]
+
+
+class Test_vgwas(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        n_snps, n_ldrs, n_voxels = 50, 45, 30
+        self.bases = rng.standard_normal((n_voxels, n_ldrs)).astype(np.float32)
+        a = rng.standard_normal((n_ldrs, n_ldrs))
+        self.ldr_cov = (a @ a.T / n_ldrs + np.eye(n_ldrs)).astype(np.float32)
+        self.beta = (rng.standard_normal((n_snps, n_ldrs)) * 0.01).astype(np.float32)
+        self.z = (rng.standard_normal((n_snps, n_ldrs)) + 5).astype(np.float32)
+        self.snp_idxs = np.ones(n_snps, dtype=bool)
+        self.snp_idxs[::7] = False
+        self.n = np.full((self.snp_idxs.sum(), 1), 1000, dtype=np.float32)
+        self.ldr_gwas = LDRGWAS(self.beta, self.z)
+
+    def test_vgwas(self):
+        beta = self.beta[self.snp_idxs].astype(np.float64)
+        z = self.z[self.snp_idxs].astype(np.float64)
+        true_ztz_inv = np.mean(
+            ((beta / z) ** 2 + beta ** 2 / self.n) / np.diag(self.ldr_cov), axis=1
+        ).reshape(-1, 1)
+        voxel_idxs = np.arange(0, 30, 2)
+        base = self.bases[voxel_idxs].astype(np.float64)
+        true_voxel_beta = beta @ base.T
+        true_voxel_se = np.sqrt(
+            np.sum(base @ self.ldr_cov * base, axis=1) * true_ztz_inv
+            - true_voxel_beta ** 2 / self.n
+        )
+
+        for threads in (1, 3):
+            vgwas = VGWAS(self.bases, self.ldr_cov, self.ldr_gwas,
+                          self.snp_idxs, self.n, threads)
+            self.assertTrue(np.allclose(vgwas.ztz_inv, true_ztz_inv, rtol=1e-4))
+            voxel_beta = vgwas.recover_beta(voxel_idxs, threads)
+            self.assertTrue(np.allclose(voxel_beta, true_voxel_beta, atol=1e-5))
+            voxel_se = vgwas.recover_se(voxel_idxs, voxel_beta)
+            self.assertTrue(np.allclose(voxel_se, true_voxel_se, rtol=1e-4))
+
+            # without the Cholesky factor
+            vgwas.ldr_cov_chol = None
+            voxel_se = vgwas.recover_se(voxel_idxs, voxel_beta)
+            self.assertTrue(np.allclose(voxel_se, true_voxel_se, rtol=1e-4))
+
+    def test_no_snps(self):
+        snp_idxs = np.zeros(len(self.snp_idxs), dtype=bool)
+        n = np.zeros((0, 1), dtype=np.float32)
+        voxel_idxs = np.arange(0, 30, 2)
+        vgwas = VGWAS(self.bases, self.ldr_cov, self.ldr_gwas, snp_idxs, n, 1)
+        voxel_beta = vgwas.recover_beta(voxel_idxs, 1)
+        self.assertEqual(voxel_beta.shape, (0, len(voxel_idxs)))
+        voxel_se = vgwas.recover_se(voxel_idxs, voxel_beta)
+        self.assertEqual(voxel_se.shape, (0, len(voxel_idxs)))
+
+
+class Test_get_interval_snp_idxs(unittest.TestCase):
+    def test_get_interval_snp_idxs(self):
+        snpinfo = pd.DataFrame({'CHR': [1, 1, 2, 2, 2, 2, 3],
+                                'POS': [5, 6, 1, 3, 3, 8, 4]})
+        true_idxs = np.array([False, False, False, True, True, False, False])
+        snp_idxs = get_interval_snp_idxs(snpinfo, 2, 1, 8)
+        self.assertTrue(np.array_equal(snp_idxs, true_idxs))
+
+        # unsorted positions
+        snpinfo = snpinfo.iloc[[0, 1, 5, 3, 2, 4, 6]].reset_index(drop=True)
+        true_idxs = np.array([False, False, False, True, False, True, False])
+        snp_idxs = get_interval_snp_idxs(snpinfo, 2, 1, 8)
+        self.assertTrue(np.array_equal(snp_idxs, true_idxs))
+
+
+class Test_get_sig_idxs(unittest.TestCase):
+    def test_get_sig_idxs(self):
+        voxel_beta = np.array([[0, 1, -2, 0, 0.1],
+                               [3, 0, 0.5, np.nan, -1]], dtype=np.float32)
+        voxel_se = np.array([[0, 0, 0, 1, 1],
+                             [1, 0, 0.1, 1, np.nan]], dtype=np.float32)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            voxel_z = voxel_beta / voxel_se
+        for thresh_chisq in (0, 3.84):
+            true_sig_idxs = voxel_z * voxel_z >= thresh_chisq
+            sig_idxs = get_sig_idxs(voxel_beta, voxel_se, thresh_chisq)
+            assert_array_equal(true_sig_idxs, sig_idxs)
+
+
+class Test_process_voxels(unittest.TestCase):
+    def test_process_voxels(self):
+        rng = np.random.default_rng(1)
+        n_snps, n_voxels = 20, 6
+        snp_info = pd.DataFrame({'CHR': 1, 'SNP': [f'rs{i}' for i in range(n_snps)],
+                                 'POS': np.arange(n_snps)}, index=np.arange(n_snps) * 2)
+        voxel_beta = rng.standard_normal((n_snps, n_voxels)).astype(np.float32)
+        voxel_se = np.ones((n_snps, n_voxels), dtype=np.float32)
+        all_sig_idxs = voxel_beta * voxel_beta >= 1
+        all_sig_idxs[:, 2] = False
+        voxel_idxs = np.array([0, 3, 5, 7, 8, 9])
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            outputs = []
+            for max_rows in (1000000, 5):
+                outpath = os.path.join(tmpdir, f'out{max_rows}.txt')
+                process_voxels(voxel_idxs, all_sig_idxs, format_snp_info(snp_info),
+                               voxel_beta, voxel_se, outpath,
+                               max_rows=max_rows)
+                outputs.append(pd.read_csv(outpath, sep='\t', header=None))
+
+        assert_frame_equal(outputs[0], outputs[1])
+        output = outputs[0]
+        self.assertEqual(len(output), np.sum(all_sig_idxs))
+        true_index = np.repeat(voxel_idxs + 1, np.sum(all_sig_idxs, axis=0))
+        self.assertTrue(np.array_equal(output[0], true_index))
+        true_snps = [f'rs{i}' for i in np.nonzero(all_sig_idxs.T)[1]]
+        self.assertEqual(list(output[2]), true_snps)
+
+    def test_output_format(self):
+        snp_info = pd.DataFrame({'CHR': [1, 2], 'SNP': ['rs1', 'rs2'],
+                                 'POS': [100, 200], 'MAF': [0.25, np.nan]})
+        voxel_beta = np.array([[2, 0.5], [-1, -3]], dtype=np.float32)
+        voxel_se = np.array([[1, 0.25], [0, 1.5]], dtype=np.float32)
+        all_sig_idxs = np.ones((2, 2), dtype=bool)
+        true_output = (
+            '1\t1\trs1\t100\t2.50000e-01\t2.00000e+00\t1.00000e+00\t2.00000e+00\t4.55003e-02\n'
+            '1\t2\trs2\t200\tNA\t-1.00000e+00\t0.00000e+00\t-inf\t0.00000e+00\n'
+            '5\t1\trs1\t100\t2.50000e-01\t5.00000e-01\t2.50000e-01\t2.00000e+00\t4.55003e-02\n'
+            '5\t2\trs2\t200\tNA\t-3.00000e+00\t1.50000e+00\t-2.00000e+00\t4.55003e-02\n'
+        )
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            outpath = os.path.join(tmpdir, 'out.txt')
+            with np.errstate(divide='ignore'):
+                process_voxels(np.array([0, 4]), all_sig_idxs, format_snp_info(snp_info),
+                               voxel_beta, voxel_se, outpath)
+            with open(outpath) as file:
+                self.assertEqual(file.read(), true_output)
+
+
 # class Test_recover_se(unittest.TestCase):
 #     def test_recover_se(self):
 #         bases = np.load(os.path.join(MAIN_DIR, 'bases.npy'))[:, :3]